@@ -9,14 +9,14 @@ fi
 
 # General utils
 apt-get update
-apt-get install zip
+apt-get install zip poppler-utils
 
 # EES Tools
 git clone https://github.com/edition-esser-skala/ees-tools.git
 mv ees-tools /opt/ees-tools
 
 # Python packages
-pip install GitPython numpy pandas segno strictyaml termcolor texoutparse
+pip install GitPython numpy pandas segno strictyaml termcolor
 
 # TinyTex
 wget https://yihui.org/tinytex/install-bin-unix.sh
@@ -1,20 +1,29 @@
 .RECIPEPREFIX = >
 .DEFAULT_GOAL = info
-LILYPOND = lilypond -ddelete-intermediate-files -dno-point-and-click --include=$(EES_TOOLS_PATH)/
+LILYPOND = $(if $(EES_ENGRAVE_CACHE),python $(EES_TOOLS_PATH)/utils/engrave_cache.py )lilypond -ddelete-intermediate-files -dno-point-and-click --include=$(EES_TOOLS_PATH)/
 notes = $(shell find notes -name '*.ly' | sed -E 's#notes/(.*)\.ly#\1#g' | tr '\n' ' ')
 scores = $(shell find scores -name '*.ly' | sed -E 's#scores/(.*)\.ly#\1#g' | tr '\n' ' ')
 
 # dependencies of scores
 
-## individual scores (e.g., 'make full_score')
+## individual scores (e.g., 'make full_score'); the notes and other
+## included files each score uses are listed in 'tmp/<score>.d'
 $(scores): %: tmp/%.pdf
-$(scores:%=tmp/%.pdf): tmp/%.pdf: scores/%.ly \
-                                  $(notes:%=notes/%.ly) \
-                                  definitions.ly
+$(scores:%=tmp/%.pdf): tmp/%.pdf: scores/%.ly definitions.ly
 >mkdir -p tmp
 >$(LILYPOND) -dlog-file=$(basename $@).ly -o tmp '$(realpath $<)'
 >cat $(basename $@).ly.log
 
+## dependency files of scores, created by ly_deps.py
+$(scores:%=tmp/%.d): tmp/%.d: scores/%.ly \
+                              $(notes:%=notes/%.ly) \
+                              definitions.ly
+>python $(EES_TOOLS_PATH)/utils/ly_deps.py -t tmp/$*.pdf $<
+
+ifneq ($(filter-out info macros final/midi,$(MAKECMDGOALS)),)
+-include $(scores:%=tmp/%.d)
+endif
+
 ## all scores ('make scores')
 .PHONY: scores
 scores: $(scores)
@@ -29,13 +38,20 @@ final/midi:
 >if [ -d midi ]; then zip -j final/midi_collection.zip midi/*; fi
 
 
+## front matter macros of all scores (e.g., 'front_matter/full_score.macros'),
+## created by a single call of read_metadata.py
+.PHONY: macros
+macros:
+>python $(EES_TOOLS_PATH)/read_metadata.py edition -c tag --types $(scores) \
+>    $(if $(EES_METADATA_SOCKET),--via-socket $(EES_METADATA_SOCKET))
+
 ## individual final scores (e.g., 'make final/full_score')
 $(scores:%=final/%): %: %.pdf
 $(scores:%=final/%.pdf): final/%.pdf: front_matter/critical_report.tex \
                                       tmp/%.pdf \
                                       metadata.yaml \
-                                      CHANGELOG.md
->python $(EES_TOOLS_PATH)/read_metadata.py edition -c tag -t $*
+                                      CHANGELOG.md \
+                                      | macros
 >latexmk -cd \
 >        -lualatex \
 >        -outdir=../final \
@@ -62,6 +78,7 @@ info:
 >echo "* $${color}$(subst $(space),$(sep),$(scores))$${reset}: individual scores (LilyPond output only)"; \
 >echo "* $${color}scores$${reset}: all scores"; \
 >echo "* $${color}$(subst $(space),$(sep),$(scores:%=final/%))$${reset}: individual final scores (LilyPond output + front matter)"; \
+>echo "* $${color}macros$${reset}: front matter macros of all scores"; \
 >echo "* $${color}final/midi$${reset}: MIDI archive"; \
 >echo "* $${color}final/scores$${reset}: all final scores and the MIDI archive"; \
 >echo "* $${color}info$${reset}: prints this message"
@@ -3,101 +3,773 @@
 """Parse LilyPond and LaTeX logs to look for warnings."""
 
 import argparse
+import collections
+from concurrent.futures import ProcessPoolExecutor
 import glob
+import hashlib
+import itertools
+import json
+import mmap
+import os
 import re
+import signal
+import sys
+import time
 from termcolor import cprint
-from texoutparse import LatexLogParser
 
 
-parser = argparse.ArgumentParser(
-    description="Check LaTeX and LilyPond log files for errors/warnings."
-)
-parser.add_argument(
-    "dir",
-    nargs="?",
-    default="tmp",
-    help="search this directory"
-)
-args = parser.parse_args()
+LILYPOND_MESSAGE_TEMPLATE = """
+{type} on line {line}, col {col}: {message}
+{context[0]}
+{context[1]}
+"""
 
+TEX_HEADING = \
+  "LaTeX files ---------------------------------------------------------------"
+LILYPOND_HEADING = \
+  "LilyPond files ------------------------------------------------------------"
 
-cprint(
-  "LaTeX files ---------------------------------------------------------------",
-  attrs=["bold"]
-)
+# LaTeX logs contain errors, warnings, and bad boxes,
+# LilyPond logs contain errors, warnings, and other messages
+SEVERITY_RANK = {"error": 3, "warning": 2, "badbox": 1, "other": 1}
+COLORS = {"error": "red", "warning": "yellow", "badbox": "cyan",
+          "other": "cyan"}
+
+# cache of parsed messages in each directory
+LOG_CACHE_FILE = ".parse_logs_cache.json"
+LOG_CACHE_VERSION = 2
 
-parser = LatexLogParser()
-tex_errors_found = False
-for tex_logs in glob.glob(f"{args.dir}/*.tex.log"):
-    with open(tex_logs, encoding="utf8") as f:
-        parser.process(f)
-
-    if len(parser.errors) + len(parser.warnings) + len(parser.badboxes) > 0:
-        cprint(f"File: {tex_logs}", attrs=["underline"])
-        tex_errors_found = True
-        for e in parser.errors:
-            cprint(e, "red")
-        for w in parser.warnings:
-            cprint(w, "yellow")
-        for b in parser.badboxes:
-            cprint(b, "cyan")
-if not tex_errors_found:
-    cprint("No problems detected! :)", "green")
-
-cprint(
-  "LilyPond files ------------------------------------------------------------",
-  attrs=["bold"]
+# follow mode: polling interval (min, max) in seconds, and the number
+# of bytes at the beginning of each log and before the read position
+# used to detect rewritten logs
+FOLLOW_INTERVAL = (0.1, 2.0)
+LOG_HEADER_SIZE = 256
+LOG_TAIL_SIZE = 256
+
+# LaTeX messages (compatible with texoutparse)
+TEX_CONTEXT_LINES = 2
+
+re_tex_error = re.compile(
+    r"^(?:! ((?:La|pdf)TeX|Package|Class)(?: (\w+))? [eE]rror"
+    r"(?: \(([\\]?\w+)\))?: (.*)|! (.*))"
+)
+re_tex_warning = re.compile(
+    r"^((?:La|pdf)TeX|Package|Class)(?: (\w+))? [wW]arning"
+    r"(?: \(([\\]?\w+)\))?: (.*)"
+)
+re_tex_badbox = re.compile(
+    r"^(Over|Under)full \\([hv])box "
+    r"\((?:badness (\d+)|(\d+(?:\.\d+)?pt) too \w+)\) (?:"
+    r"(?:(?:in paragraph|in alignment|detected) "
+    r"(?:at lines (\d+)--(\d+)|at line (\d+)))"
+    r"|(?:has occurred while [\\]output is active [\[][\]]))"
 )
 
-LILYPOND_MESSAGE_TEMPLATE = """
-{type} on line {line}, col {col}: {message}
-{context_line_1}
-{context_line_2}
-"""
+# lines that might contain one of these messages
+TEX_CANDIDATE = (rb"(?:! |(?:Over|Under)full \\[hv]box \("
+                 rb"|(?:(?:La|pdf)TeX|Package|Class)(?: [^\s:]+)? [wW]arning)")
+re_tex_candidate_first = re.compile(TEX_CANDIDATE)
+re_tex_candidate = re.compile(rb"\n" + TEX_CANDIDATE)
 
+# LilyPond messages
 re_warning_error = re.compile("([^:]+):([^:]+):([^:]+):([^:]+):(.+)")
-re_other_warning = re.compile("$warning:|Warnung:")
+re_other_warning = re.compile("(warning|Warnung):")
 
-ly_errors_found = False
-for ly_logs in glob.glob(f"{args.dir}/*.ly.log"):
-    with open(ly_logs, encoding="utf8") as f:
-        lines = list(f.readlines())
 
-    messages = []
-    for line_no, line in enumerate(lines):
+# Log scanners -----------------------------------------------------------
+
+def lilypond_severity(message_type):
+    """Classify the type of a LilyPond message."""
+    message_type = message_type.lower()
+    if message_type in ["fehler", "error", "fatal error"]:
+        return "error"
+    if message_type in ["warnung", "warning"]:
+        return "warning"
+    return "other"
+
+
+class LilypondLogScanner:
+    """Find messages in a LilyPond log that is fed line by line.
+       Each message is a dict with keys line, col, type, message,
+       context (the two following lines), and severity."""
+
+    def __init__(self):
+        # messages wait in this queue until their context lines have been read
+        self.pending = collections.deque()
+
+    @staticmethod
+    def complete(record):
+        """Check whether all context lines of a message have been read."""
+        return record["context"] is None or len(record["context"]) == 2
+
+    def feed(self, line):
+        """Process a line and return the messages that are complete."""
+        for item in self.pending:
+            if not self.complete(item):
+                item["context"].append(line.strip("\n"))
+        res = []
+        while self.pending and self.complete(self.pending[0]):
+            res.append(self.pending.popleft())
+
         message = re_warning_error.match(line)
         if message:
             message_type = message.group(4).strip()
-            if message_type in ["Fehler", "Error"]:
-                color = "red"
-            elif message_type in ["Warnung", "Warning"]:
-                color = "yellow"
+            self.pending.append(dict(
+                line=message.group(2),
+                col=message.group(3),
+                type=message_type,
+                message=message.group(5).strip(),
+                context=[],
+                severity=lilypond_severity(message_type)
+            ))
+        elif (re_other_warning.match(line)
+              and line.count("MIDI") + line.count("modulo") == 0):
+            # messages without position do not have context lines
+            record = dict(line=None, col=None, type="warning",
+                          message=line.strip("\n"), context=None,
+                          severity="warning")
+            if self.pending:
+                self.pending.append(record)
             else:
-                color = "cyan"
-            messages.append(
-                dict(
-                    line=message.group(2),
-                    col=message.group(3),
-                    type=message_type,
-                    message=message.group(5).strip(),
-                    context_line_1=lines[line_no + 1].strip("\n"),
-                    context_line_2=lines[line_no + 2].strip("\n"),
-                    color=color
-                )
-            )
-        message = re_other_warning.match(line)
-        if message:
-            if line.count("MIDI") + line.count("modulo") == 0:
-                messages.append(line)
+                res.append(record)
+        return res
+
+    def flush(self):
+        """Return the remaining messages at the end of the log,
+           which lack some context lines."""
+        res = list(self.pending)
+        self.pending.clear()
+        for record in res:
+            if record["context"] is not None:
+                record["context"] += [""] * (2 - len(record["context"]))
+        return res
+
+
+def scan_lilypond_log(lines, max_errors=None):
+    """Yield the messages found in the lines of a LilyPond log
+       (see LilypondLogScanner). Only two lines are kept in memory,
+       and scanning stops after `max_errors` errors."""
+    scanner = LilypondLogScanner()
+    n_errors = 0
+    for records in itertools.chain(map(scanner.feed, lines),
+                                   [scanner.flush()]):
+        for record in records:
+            yield record
+            if record["severity"] == "error":
+                n_errors += 1
+                if max_errors is not None and n_errors >= max_errors:
+                    return
+
+
+def format_lilypond_message(record):
+    """Format a message found by scan_lilypond_log()."""
+    if record["line"] is None:
+        return record["message"] + "\n"
+    return LILYPOND_MESSAGE_TEMPLATE.format(**record)
+
+
+def match_tex_line(line):
+    """Check whether a line of a LaTeX log starts a bad box, warning, or
+       error message. Returns a tuple (severity, info) or None."""
+    # the first character determines which pattern may match
+    if line.startswith("!"):
+        severity, match = "error", re_tex_error.match(line)
+    elif line.startswith(("Over", "Under")):
+        severity, match = "badbox", re_tex_badbox.match(line)
+    else:
+        severity, match = "warning", re_tex_warning.match(line)
+    if match is None:
+        return None
+
+    if severity == "badbox":
+        return "badbox", {
+            "type": match.group(1),
+            "direction": match.group(2),
+            "by": match.group(3) or match.group(4),
+            "lines": ([match.group(7), match.group(7)]
+                      if match.group(7) is not None
+                      else [match.group(5), match.group(6)])
+        }
+
+    if severity == "error" and match.group(1) is None:
+        return "error", {"message": match.group(5)}
+
+    info = {"type": match.group(1)}
+    if match.group(1) == "Package":
+        info["package"] = match.group(2)
+    elif match.group(1) == "Class":
+        info["class"] = match.group(2)
+    elif match.group(2) is not None:
+        info["component"] = match.group(2)
+    if match.group(3) is not None:
+        info["extra"] = match.group(3)
+    info["message"] = match.group(4)
+    return severity, info
+
+
+def tex_message(severity, info, context_lines):
+    """Assemble a message found in a LaTeX log. The context comprises
+       the line with the message and the following two lines."""
+    return {"severity": severity,
+            **info,
+            "context": [line.strip("\n") for line in context_lines],
+            "text": "\n".join(context_lines)}
+
+
+def scan_tex_log(data):
+    """Find errors, warnings, and bad boxes in the contents of a LaTeX
+       log (bytes or memory-mapped file)."""
+    # A quick search for lines that might start a message (which benefits
+    # from the literal newline prefix) precedes the exact match.
+    starts = [0] if re_tex_candidate_first.match(data) else []
+    starts += [m.start() + 1 for m in re_tex_candidate.finditer(data)]
+
+    messages = {"error": [], "warning": [], "badbox": []}
+    for start in starts:
+        end = start
+        for _ in range(TEX_CONTEXT_LINES + 1):
+            end = data.find(b"\n", end) + 1
+            if end == 0:
+                end = len(data)
+                break
+        *context_lines, last = (data[start:end]
+                                .decode("utf8", errors="replace")
+                                .split("\n"))
+        context_lines = [line + "\n" for line in context_lines]
+        if last:
+            context_lines.append(last)
+
+        match = match_tex_line(context_lines[0])
+        if match is not None:
+            messages[match[0]].append(tex_message(*match, context_lines))
+    return messages["error"] + messages["warning"] + messages["badbox"]
+
+
+def check_tex_log(file):
+    """Find errors, warnings, and bad boxes in a LaTeX log."""
+    with open(file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan_tex_log(data)
+
+
+class TexLogScanner:
+    """Find messages in a LaTeX log that is fed line by line.
+       Each message is a dict (see tex_message())."""
+
+    def __init__(self):
+        # messages wait in this queue until their context lines have been read
+        self.pending = collections.deque()
+
+    def feed(self, line):
+        """Process a line and return the messages that are complete."""
+        for _, _, context_lines in self.pending:
+            if len(context_lines) <= TEX_CONTEXT_LINES:
+                context_lines.append(line)
+        res = []
+        while (self.pending
+               and len(self.pending[0][2]) > TEX_CONTEXT_LINES):
+            res.append(tex_message(*self.pending.popleft()))
+
+        match = match_tex_line(line)
+        if match is not None:
+            self.pending.append((*match, [line]))
+        return res
+
+    def flush(self):
+        """Return the remaining messages at the end of the log."""
+        res = [tex_message(*item) for item in self.pending]
+        self.pending.clear()
+        return res
+
+
+def log_kind(file):
+    """Determine whether a file is a LaTeX ('tex') or LilyPond ('ly') log."""
+    return "tex" if file.endswith(".tex.log") else "ly"
+
+
+def check_log(file, max_errors=None):
+    """Check a LaTeX or LilyPond log.
+       Returns a dict with keys file, kind ('tex' or 'ly'), and messages."""
+    if log_kind(file) == "tex":
+        return {"file": file, "kind": "tex", "messages": check_tex_log(file)}
+
+    with open(file, encoding="utf8") as f:
+        messages = list(scan_lilypond_log(f, max_errors))
+    return {"file": file, "kind": "ly", "messages": messages}
+
+
 
-    if messages:
-        cprint(f"File: {ly_logs}", attrs=["underline"])
-        ly_errors_found = True
-        for m in messages:
+# Log cache ---------------------------------------------------------------
+# Each directory contains a cache that stores the messages of each log,
+# together with its size, modification time, and SHA256 hash. A log is
+# unchanged if size and modification time match, or if only the
+# modification time differs but the hash matches.
+
+def file_hash(file):
+    """Calculate the SHA256 hash of a file."""
+    sha256 = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def parse_log(file, max_errors=None):
+    """Check a log and determine its signature for the log cache.
+       Returns a tuple (signature, report)."""
+    # The signature is obtained before parsing so that a log which is
+    # modified in the meantime is parsed again in the next run.
+    stat = os.stat(file)
+    signature = {"size": stat.st_size,
+                 "mtime_ns": stat.st_mtime_ns,
+                 "sha256": file_hash(file)}
+    return signature, check_log(file, max_errors)
+
+
+def load_log_cache(directory, max_errors):
+    """Load the log cache of a directory."""
+    try:
+        with open(os.path.join(directory, LOG_CACHE_FILE),
+                  encoding="utf8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if (not isinstance(cache, dict)
+            or cache.get("version") != LOG_CACHE_VERSION
+            or cache.get("max_errors") != max_errors):
+        return {}
+    return cache.get("files", {})
+
+
+def save_log_cache(directory, max_errors, entries):
+    """Save the log cache of a directory (atomically)."""
+    cache_file = os.path.join(directory, LOG_CACHE_FILE)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf8") as f:
+            json.dump({"version": LOG_CACHE_VERSION,
+                       "max_errors": max_errors,
+                       "files": entries}, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # the cache is optional (e.g., if the directory is read-only)
+        pass
+
+
+def lookup_log_cache(cache, file):
+    """Return the cache entry of a log if the log is unchanged."""
+    entry = cache.get(os.path.basename(file))
+    if entry is None:
+        return None
+    stat = os.stat(file)
+    if entry["size"] != stat.st_size:
+        return None
+    if entry["mtime_ns"] != stat.st_mtime_ns:
+        if entry["sha256"] != file_hash(file):
+            return None
+        entry["mtime_ns"] = stat.st_mtime_ns
+    return entry
+
+
+
+# Dispatcher functions ----------------------------------------------------
+
+
+class LogFollower:
+    """Read the lines appended to a log since the previous call of poll()
+       and pass them to a scanner."""
+
+    def __init__(self, file, from_start):
+        self.file = file
+        self.kind = log_kind(file)
+        self.header = b""
+        self.tail = b""
+        self.reset()
+        if not from_start:
+            # only report lines that are appended from now on, unless
+            # the log is rewritten
             try:
-                cprint(LILYPOND_MESSAGE_TEMPLATE.format(**m), m["color"])
-            except TypeError:
-                cprint(m, "yellow")
+                with open(file, "rb") as f:
+                    self.header = f.read(LOG_HEADER_SIZE)
+                    self.offset = f.seek(0, os.SEEK_END)
+                    f.seek(max(0, self.offset - LOG_TAIL_SIZE))
+                    self.tail = f.read(LOG_TAIL_SIZE)
+            except FileNotFoundError:
+                pass
+
+    def reset(self):
+        """Start reading the log from the beginning."""
+        self.scanner = (TexLogScanner() if self.kind == "tex"
+                        else LilypondLogScanner())
+        self.offset = 0
+        self.tail = b""
+        self.remainder = b""
+        self.inode = None
+
+    def rewritten(self, f, stat):
+        """Check whether the log has been replaced, truncated, or rewritten
+           in place. The header of a LilyPond log is the same in each run,
+           so the bytes before the read position are compared as well."""
+        if self.inode is not None and stat.st_ino != self.inode:
+            return True
+        if stat.st_size < self.offset:
+            return True
+        f.seek(0)
+        if not f.read(LOG_HEADER_SIZE).startswith(self.header):
+            return True
+        f.seek(self.offset - len(self.tail))
+        return f.read(len(self.tail)) != self.tail
+
+    def poll(self):
+        """Return the number of bytes read and the complete messages."""
+        try:
+            with open(self.file, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if self.offset > 0 and self.rewritten(f, stat):
+                    self.reset()
+                self.inode = stat.st_ino
+                if self.offset < LOG_HEADER_SIZE:
+                    f.seek(0)
+                    self.header = f.read(LOG_HEADER_SIZE)
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0, []
+        self.offset += len(data)
+        self.tail = (self.tail + data)[-LOG_TAIL_SIZE:]
+
+        # incomplete lines are processed in the next call
+        *lines, self.remainder = (self.remainder + data).split(b"\n")
+        res = []
+        for line in lines:
+            res += self.scanner.feed(
+                line.decode("utf8", errors="replace") + "\n"
+            )
+        return len(data), res
+
+
+def signal_name(name):
+    """Convert a signal name (e.g., 'TERM' or 'SIGTERM') for argparse."""
+    try:
+        return signal.Signals["SIG" + name.upper().removeprefix("SIG")]
+    except KeyError:
+        raise argparse.ArgumentTypeError(
+            f"invalid signal '{name}'"
+        ) from None
+
+
+def process_alive(pid):
+    """Check whether a process (or process group, if pid < 0) exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def follow_logs(patterns, max_errors=None, kill_pid=None,
+                kill_signal=signal.SIGTERM, exit_on_error=False):
+    """Print messages while logs are written, polling the directories
+       with increasing intervals as long as the logs do not change.
+       On the first error, send a signal to process `kill_pid` and/or
+       return 2. Once process `kill_pid` has finished, returns 2 if the
+       signal has been sent and 0 otherwise."""
+    followers = {}
+    n_errors = {}
+    last_file = None
+    signal_sent = False
+    first_poll = True
+    interval = FOLLOW_INTERVAL[0]
+
+    def report(file, messages):
+        """Print messages and handle errors. Returns True if following
+           should stop."""
+        nonlocal last_file, signal_sent
+        for message in messages:
+            if max_errors is not None and n_errors[file] >= max_errors:
+                return False
+            if file != last_file:
+                cprint(f"File: {file}", attrs=["underline"])
+                last_file = file
+            if followers[file].kind == "tex":
+                text = message["text"]
+            else:
+                text = format_lilypond_message(message)
+            cprint(text, COLORS[message["severity"]], flush=True)
+
+            if message["severity"] != "error":
+                continue
+            n_errors[file] += 1
+            if kill_pid is not None and not signal_sent:
+                cprint(f"Error found, sending {kill_signal.name} "
+                       f"to process {kill_pid}", "red", attrs=["bold"],
+                       flush=True)
+                try:
+                    os.kill(kill_pid, kill_signal)
+                except ProcessLookupError:
+                    pass
+                signal_sent = True
+            if exit_on_error:
+                return True
+        return False
+
+    while True:
+        # read the logs once more after the process has finished
+        finished = kill_pid is not None and not process_alive(kill_pid)
+
+        n_bytes = 0
+        for file in (find_logs(patterns, ".tex.log")
+                     + find_logs(patterns, ".ly.log")):
+            if file not in followers:
+                # logs that already exist when following starts are only
+                # read from the beginning once they are rewritten
+                followers[file] = LogFollower(file,
+                                              from_start=not first_poll)
+                n_errors[file] = 0
+            n, messages = followers[file].poll()
+            n_bytes += n
+            if finished:
+                messages += followers[file].scanner.flush()
+            if report(file, messages):
+                return 2
+
+        if finished:
+            return 2 if signal_sent else 0
+        first_poll = False
+
+        # poll again soon while logs change, otherwise back off
+        if n_bytes > 0:
+            interval = FOLLOW_INTERVAL[0]
+        else:
+            interval = min(interval * 2, FOLLOW_INTERVAL[1])
+        time.sleep(interval)
+
+
+def find_logs(patterns, suffix):
+    """Find log files in all directories that match the patterns."""
+    res = []
+    for pattern in patterns:
+        for directory in sorted(glob.glob(pattern)):
+            res += sorted(glob.glob(os.path.join(directory, f"*{suffix}")))
+    return res
+
+
+def check_logs(patterns, jobs=1, max_errors=None, use_cache=True):
+    """Check the LaTeX and LilyPond logs in all directories that match
+       the patterns, using `jobs` worker processes. Returns a list of
+       reports (see check_log()) in a stable order. The key `cached` of
+       each report indicates whether it was taken from the log cache."""
+    files = find_logs(patterns, ".tex.log") + find_logs(patterns, ".ly.log")
+
+    # serve unchanged logs from the cache
+    reports = {}
+    caches = {}
+    changed = set()  # directories whose cache must be saved
+    stale_files = []
+    for file in files:
+        directory = os.path.dirname(file)
+        if use_cache:
+            if directory not in caches:
+                caches[directory] = load_log_cache(directory, max_errors)
+            cache = caches[directory]
+            mtime_ns = cache.get(os.path.basename(file), {}).get("mtime_ns")
+            entry = lookup_log_cache(cache, file)
+            if entry is not None:
+                if entry["mtime_ns"] != mtime_ns:
+                    changed.add(directory)
+                reports[file] = {"file": file, "kind": log_kind(file),
+                                 "messages": entry["messages"],
+                                 "cached": True}
+                continue
+        stale_files.append(file)
+
+    # parse new or changed logs
+    if jobs > 1 and len(stale_files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(parse_log, stale_files,
+                                        itertools.repeat(max_errors)))
+    else:
+        results = [parse_log(f, max_errors) for f in stale_files]
+
+    for file, (signature, report) in zip(stale_files, results):
+        reports[file] = {**report, "cached": False}
+        if use_cache:
+            caches[os.path.dirname(file)][os.path.basename(file)] = {
+                **signature, "messages": report["messages"]
+            }
+            changed.add(os.path.dirname(file))
+
+    # entries of deleted logs are dropped; unchanged caches are not saved
+    # again, which avoids a write per directory on each run
+    for directory, cache in caches.items():
+        entries = {name: entry for name, entry in sorted(cache.items())
+                   if os.path.join(directory, name) in reports}
+        if directory in changed or len(entries) < len(cache):
+            save_log_cache(directory, max_errors, entries)
+
+    return [reports[f] for f in files]
+
+
+def summarize(reports):
+    """Count the messages of each severity."""
+    summary = {severity: 0 for severity in SEVERITY_RANK}
+    for report in reports:
+        for message in report["messages"]:
+            summary[message["severity"]] += 1
+    return summary
+
+
+def print_reports(reports):
+    """Print the messages of all logs in color."""
+    for kind, heading in (("tex", TEX_HEADING), ("ly", LILYPOND_HEADING)):
+        cprint(heading, attrs=["bold"])
+        problems_found = False
+        for report in reports:
+            if report["kind"] != kind or not report["messages"]:
+                continue
+            cprint(f"File: {report['file']}", attrs=["underline"])
+            problems_found = True
+            for message in report["messages"]:
+                if kind == "tex":
+                    text = message["text"]
+                else:
+                    text = format_lilypond_message(message)
+                cprint(text, COLORS[message["severity"]])
+        if not problems_found:
+            cprint("No problems detected! :)", "green")
+
+
+def exit_status(summary, fail_on):
+    """Determine the exit status: 2 if errors were found, 1 if only less
+       severe problems were found, and 0 if no problem is at least as
+       severe as `fail_on`."""
+    if fail_on is None:
+        return 0
+    found = [SEVERITY_RANK[s] for s, n in summary.items() if n > 0]
+    if not found or max(found) < SEVERITY_RANK[fail_on]:
+        return 0
+    return 2 if summary["error"] > 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check LaTeX and LilyPond log files for errors/warnings."
+    )
+    parser.add_argument(
+        "dirs",
+        nargs="*",
+        default=["tmp"],
+        help="""search these directories, which may be glob patterns
+                (default: tmp)""",
+        metavar="DIR"
+    )
+    parser.add_argument(
+        "-m",
+        "--max-errors",
+        type=int,
+        default=None,
+        help="""stop scanning a LilyPond log after N errors
+                (default: no limit)""",
+        metavar="N"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="check N log files in parallel (default: 1)",
+        metavar="N"
+    )
+    parser.add_argument(
+        "--json",
+        default=None,
+        help="""write a JSON report to FILE ('-' prints the report
+                instead of the colored messages)""",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "--fail-on",
+        choices=["error", "warning", "badbox"],
+        default=None,
+        help="""exit with a non-zero status if a problem of this or a higher
+                severity is found (2: errors, 1: other problems)"""
+    )
+    parser.add_argument(
+        "--only-changed",
+        action="store_true",
+        help="""only report logs that are new or have changed since the
+                previous run"""
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"""parse all logs and do not use the log cache
+                 ('{LOG_CACHE_FILE}' in each directory)"""
+    )
+    parser.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="""watch the directories and print messages as soon as they
+                are written to the logs (stop with Ctrl+C)"""
+    )
+    parser.add_argument(
+        "--kill",
+        type=int,
+        default=None,
+        help="""in follow mode, send a signal to process PID (or process
+                group -PID) on the first error, and stop following once
+                the process has finished (with exit status 2 if the signal
+                has been sent)""",
+        metavar="PID"
+    )
+    parser.add_argument(
+        "--signal",
+        type=signal_name,
+        default="TERM",
+        help="send this signal to the process given by --kill (default: TERM)"
+    )
+    parser.add_argument(
+        "--exit-on-error",
+        action="store_true",
+        help="in follow mode, stop on the first error with exit status 2"
+    )
+    args = parser.parse_args()
+
+    if args.follow:
+        try:
+            sys.exit(follow_logs(
+                args.dirs,
+                args.max_errors,
+                args.kill,
+                args.signal,
+                args.exit_on_error
+            ))
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    all_reports = check_logs(args.dirs, args.jobs, args.max_errors,
+                             use_cache=not args.no_cache)
+    if args.only_changed:
+        all_reports = [r for r in all_reports if not r["cached"]]
+    all_summary = summarize(all_reports)
+
+    if args.json is None or args.json != "-":
+        print_reports(all_reports)
+    if args.json is not None:
+        json_report = json.dumps(
+            {"summary": all_summary, "files": all_reports},
+            indent=2,
+            ensure_ascii=False
+        )
+        if args.json == "-":
+            print(json_report)
+        else:
+            with open(args.json, "w", encoding="utf8") as f:
+                f.write(json_report + "\n")
 
-if not ly_errors_found:
-    cprint("No problems detected! :)", "green")
+    sys.exit(exit_status(all_summary, args.fail_on))
@@ -2,17 +2,30 @@
 
 """Parse metadata from YAML file."""
 
+import contextlib
+import copy
+import csv
+from datetime import datetime
+import hashlib
 import io
+import itertools
+import json
 import os
 import re
+import shutil
+import signal
+import socket
+import socketserver
+import stat
 import subprocess
 import sys
+import threading
+import time
 
 import argparse
-from git import Repo
-from pandas import json_normalize, read_csv
-import segno
-import strictyaml
+
+# GitPython, pandas, segno, and strictyaml take long to import and are
+# therefore only imported by the functions that need them
 
 
 
@@ -42,16 +55,127 @@ def arabic_to_roman(number=None):
     return result
 
 
+def file_signature(file):
+    """Return size and mtime of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(file)
+    except FileNotFoundError:
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_hash(file):
+    """Return the SHA256 hash of a file."""
+    with open(file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def write_json_atomic(file, data):
+    """Save data as JSON, replacing the old file atomically."""
+    tmp_file = f"{file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w", encoding="utf8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_file, file)
+
+
+
+class Profiler:
+    """Record wall time and number of calls of named phases."""
+
+    def __init__(self):
+        self.enabled = False
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager that records the time spent in a phase."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += time.perf_counter() - start
+
+    def add(self, phases):
+        """Add phases recorded elsewhere (e.g., in another process)."""
+        for name, entry in phases.items():
+            total = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0})
+            total["calls"] += entry["calls"]
+            total["seconds"] += entry["seconds"]
+
+    def reset(self):
+        """Return the recorded phases and start over."""
+        phases = {k: {"calls": v["calls"], "seconds": round(v["seconds"], 6)}
+                  for k, v in self.phases.items()}
+        self.phases = {}
+        return phases
+
+PROFILER = Profiler()
+
+
+def write_profile(args, command, start, works=None):
+    """Print the recorded phases as JSON or append them to a ledger file."""
+    record = {
+        "command": command,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "directory": os.getcwd(),
+        "total_seconds": round(time.perf_counter() - start, 6),
+        "phases": PROFILER.reset()
+    }
+    if works is not None:
+        record["works"] = works
+
+    if args.profile == "-":
+        print(json.dumps(record, indent=2))
+    else:
+        with open(args.profile, "a", encoding="utf8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
 
 # Constants ---------------------------------------------------------------
 
 EES_TOOLS_PATH = os.getenv("EES_TOOLS_PATH")
 
+# user-specific cache for data shared by all repositories
+EES_CACHE_DIR = os.getenv(
+    "EES_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ees-tools")
+)
+
 instrument_data_file = os.path.join(
     os.path.dirname(os.path.realpath(__file__)),
     "instrument_data.csv"
 )
-INSTRUMENT_METADATA = read_csv(instrument_data_file).set_index("abbreviation")
+INSTRUMENT_METADATA = {}
+INSTRUMENT_METADATA_SIGNATURE = {}
+
+def load_instrument_metadata():
+    """Read instrument_data.csv into INSTRUMENT_METADATA
+       unless the file is unchanged since the last call."""
+    signature = file_signature(instrument_data_file)
+    if INSTRUMENT_METADATA and INSTRUMENT_METADATA_SIGNATURE == signature:
+        return
+    with open(instrument_data_file, encoding="utf8") as f:
+        rows = {row["abbreviation"]: row for row in csv.DictReader(f)}
+    INSTRUMENT_METADATA.clear()
+    INSTRUMENT_METADATA.update(rows)
+    INSTRUMENT_METADATA_SIGNATURE.clear()
+    INSTRUMENT_METADATA_SIGNATURE.update(signature)
+
+load_instrument_metadata()
+
+# socket of the metadata server
+DEFAULT_SOCKET = os.path.join(
+    os.getenv("XDG_RUNTIME_DIR") or EES_CACHE_DIR,
+    "ees-tools-metadata.sock"
+)
+# seconds to wait for the metadata server before processing locally
+SOCKET_TIMEOUT = 60
 
 # abbreviations included in each edition
 DEFAULT_ABBR = {}
@@ -70,6 +194,10 @@ LICENSE_HEADINGS = {
     "cc-by-nc-sa-4.0": "Attribution-NonCommercial-ShareAlike 4.0 International"
 }
 
+# output files of the edition subcommand
+DEFAULT_MACROS_FILE = "front_matter/critical_report.macros"
+DEFAULT_MACROS_FILE_PER_TYPE = "front_matter/{type}.macros"
+
 # subfolders ignored when preparing the table
 IGNORED_COMPOSER_DIRS = ["Misc", "TODO"]
 
@@ -78,6 +206,26 @@ INCLUDED_COLUMNS = ["composer_last", "composer_suffix", "composer_first",
                     "title", "id", "genre", "scoring", "sources", "imslp",
                     "repository", "version", "date", "folder", "notes"]
 
+# catalog cache in the root directory of the table
+CATALOG_CACHE_FILE = ".works_cache.jsonl"
+CATALOG_CACHE_VERSION = 1
+
+# git metadata cache in the git directory of each repository
+GIT_INFO_CACHE_FILE = "ees_git_info.json"
+GIT_INFO_CACHE_VERSION = 1
+
+# commands and regular expressions to obtain toolchain versions
+TOOLCHAIN = {
+    "lilypond": (["lilypond", "--version"], r"GNU LilyPond ([^\s]+)"),
+    "lualatex": (["lualatex", "--version"], r"Version ([^\s]+)"),
+    "latexmk": (["latexmk", "--version"], r"Version ([^\s]+)")
+}
+TOOLCHAIN_CACHE_FILE = os.path.join(EES_CACHE_DIR, "toolchain.json")
+
+# QR codes
+QR_SCALE = 1.5
+QR_CACHE_DIR = os.path.join(EES_CACHE_DIR, "qr")
+
 
 # LaTeX templates ---------------------------------------------------------
 
@@ -96,6 +244,8 @@ METADATA_TEMPLATE = """
 \\def\\MetadataDate{{{date}}}
 \\def\\MetadataChecksum{{{checksum}}}
 \\def\\MetadataLilypondVersion{{{lilypond_version}}}
+\\def\\MetadataLualatexVersion{{{lualatex_version}}}
+\\def\\MetadataLatexmkVersion{{{latexmk_version}}}
 \\def\\MetadataEESToolsVersion{{{eestools_version}}}
 \\def\\MetadataQRCode{{{qr_code}}}
 \\def\\MetadataSources{{{sources_env}}}
@@ -104,6 +254,10 @@ METADATA_TEMPLATE = """
 
 ADDITIONAL_METADATA_TEMPLATE = "\\def\\Metadata{key}{{{value}}}"
 
+# macro names (without prefix 'Metadata') and format fields of the template
+METADATA_FIELDS = re.findall(r"\\Metadata(\w+)\{\{\{([^}]+)\}\}\}",
+                             METADATA_TEMPLATE)
+
 SUBTITLE_TEMPLATE = "{}\\newline {}"
 
 PRINCIPAL_SRC_TEMPLATE = "{} (principal source)"
@@ -148,8 +302,269 @@ PRINT_SCORE_TEMPLATE = """
 
 
 
+# Git metadata ------------------------------------------------------------
+# Resolving the remote, tags, and commits via GitPython is slow for
+# repositories with many tags. Therefore, the results are stored per process
+# and on disk in the git directory. The cache is invalidated whenever
+# HEAD, the checked out branch, packed-refs, refs/tags, or the config change.
+
+GIT_INFO = {}
+
+def find_git_dir(path):
+    """Return the git directory of the repository in PATH (or None)."""
+    dot_git = os.path.join(path, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isfile(dot_git):
+        with open(dot_git, encoding="utf8") as f:
+            content = f.read().strip()
+        if content.startswith("gitdir:"):
+            return os.path.join(path, content.removeprefix("gitdir:").strip())
+    return None
+
+
+def git_fingerprint(git_dir):
+    """Compute a fingerprint of the refs in a git directory."""
+    common_dir = git_dir
+    if os.path.isfile(os.path.join(git_dir, "commondir")):
+        with open(os.path.join(git_dir, "commondir"), encoding="utf8") as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+
+    try:
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf8") as f:
+            head = f.read().strip()
+    except FileNotFoundError:
+        return None
+
+    files = [os.path.join(git_dir, "HEAD"),
+             os.path.join(common_dir, "packed-refs"),
+             os.path.join(common_dir, "config")]
+    if head.startswith("ref:"):
+        files.append(os.path.join(common_dir, head.removeprefix("ref:").strip()))
+    for root, _, tag_files in os.walk(os.path.join(common_dir, "refs", "tags")):
+        files.extend(os.path.join(root, t) for t in sorted(tag_files))
+
+    parts = [head] + [[f, file_signature(f)] for f in files]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def describe_commit(commit):
+    """Return date and SHA1 of a commit."""
+    return {"date": commit.committed_datetime.strftime("%Y-%m-%d"),
+            "checksum": commit.hexsha}
+
+
+def resolve_git_info(path):
+    """Obtain URL of the remote 'origin', most recent tag, and HEAD
+       of a repository via GitPython."""
+    from git import Repo # pylint: disable=import-outside-toplevel
+
+    repo = Repo(path)
+    info = {"origin_url": None, "tag": None, "head": None}
+
+    if "origin" in repo.remotes:
+        info["origin_url"] = repo.remotes.origin.url
+
+    tags = repo.tags
+    if tags:
+        info["tag"] = {"name": tags[-1].name,
+                       **describe_commit(tags[-1].commit)}
+
+    try:
+        info["head"] = describe_commit(repo.head.commit)
+    except ValueError:  # no commits yet
+        pass
+
+    return info
+
+
+def get_git_info(path="."):
+    """Get (possibly cached) git metadata of the repository in PATH."""
+    key = os.path.realpath(path)
+    git_dir = find_git_dir(key)
+    if git_dir is None:
+        error_exit(f"No git repository found in {path}.")
+    fingerprint = git_fingerprint(git_dir)
+
+    # in-process cache
+    if key in GIT_INFO and GIT_INFO[key]["fingerprint"] == fingerprint:
+        return GIT_INFO[key]["info"]
+
+    # on-disk cache
+    cache_file = os.path.join(git_dir, GIT_INFO_CACHE_FILE)
+    try:
+        with open(cache_file, encoding="utf8") as f:
+            cached = json.load(f)
+        if (cached["version"] != GIT_INFO_CACHE_VERSION or
+            cached["fingerprint"] != fingerprint):
+            cached = None
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        cached = None
+
+    if cached is None:
+        cached = {"version": GIT_INFO_CACHE_VERSION,
+                  "fingerprint": fingerprint,
+                  "info": resolve_git_info(key)}
+        try:
+            write_json_atomic(cache_file, cached)
+        except OSError:  # e.g., read-only installation of EES Tools
+            pass
+
+    GIT_INFO[key] = cached
+    return cached["info"]
+
+
+
+# Toolchain versions ------------------------------------------------------
+# Starting LilyPond just to read its version is expensive. Therefore,
+# versions are stored per process and on disk, keyed by the resolved path,
+# mtime, and inode of the executable.
+
+TOOL_VERSIONS = {}
+
+def run_version_command(command, pattern):
+    """Run a command and extract the version from its output."""
+    output = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        check=False
+    ).stdout
+    version = re.search(pattern, output)
+    if version is None:
+        return "(unknown)"
+    return version.group(1)
+
+
+def get_tool_version(tool, program=None):
+    """Get the (possibly cached) version of a TOOLCHAIN program, optionally
+       calling it via another name or path (e.g., a wrapper script).
+       If the program is not installed, return an appropriate string."""
+    command, pattern = TOOLCHAIN[tool]
+    if program is not None:
+        command = [program, *command[1:]]
+    executable = shutil.which(command[0])
+    if executable is None:
+        return "(not available)"
+
+    executable = os.path.realpath(executable)
+    stat = os.stat(executable)
+    key = {"mtime_ns": stat.st_mtime_ns, "inode": stat.st_ino}
+
+    cached = TOOL_VERSIONS.get(executable)
+    if cached is None or cached["key"] != key:
+        try:
+            with open(TOOLCHAIN_CACHE_FILE, encoding="utf8") as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            cache = {}
+
+        cached = cache.get(executable)
+        if not isinstance(cached, dict) or cached.get("key") != key:
+            cached = {"key": key,
+                      "version": run_version_command(command, pattern)}
+            cache[executable] = cached
+            try:
+                os.makedirs(EES_CACHE_DIR, exist_ok=True)
+                write_json_atomic(TOOLCHAIN_CACHE_FILE, cache)
+            except OSError:
+                pass
+        TOOL_VERSIONS[executable] = cached
+
+    return cached["version"]
+
+
+
+# QR codes ----------------------------------------------------------------
+# Encoding a QR code and rendering it as TeX is slow, and the same URLs
+# are encoded on every rebuild. Therefore, the TeX code is stored per process
+# and on disk, keyed by URL, scale, and segno version.
+
+QR_CODES = {}
+
+def get_segno_version():
+    """Get the version of segno without importing it."""
+    # pylint: disable=import-outside-toplevel
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version("segno")
+    except PackageNotFoundError:
+        import segno
+        return segno.__version__
+
+
+def make_qr_codes(urls, scale=QR_SCALE):
+    """Get QR codes (as TeX code) for all URLS. Codes that are neither
+       in memory nor on disk are encoded in a single batch."""
+    missing = [u for u in dict.fromkeys(urls) if (u, scale) not in QR_CODES]
+    if not missing:
+        return {u: QR_CODES[(u, scale)] for u in urls}
+
+    segno_version = get_segno_version()
+    to_encode = []
+    for url in missing:
+        key = hashlib.sha256(
+            json.dumps([url, scale, segno_version]).encode()
+        ).hexdigest()
+        cache_file = os.path.join(QR_CACHE_DIR, f"{key}.tex")
+        try:
+            with open(cache_file, encoding="utf8") as f:
+                QR_CODES[(url, scale)] = f.read()
+        except FileNotFoundError:
+            to_encode.append((url, cache_file))
+
+    if to_encode:
+        import segno # pylint: disable=import-outside-toplevel
+
+        try:
+            os.makedirs(QR_CACHE_DIR, exist_ok=True)
+        except OSError:
+            pass
+        for url, cache_file in to_encode:
+            qr_buffer = io.StringIO()
+            segno.make_qr(url).save(qr_buffer, kind="tex", scale=scale, url=url)
+            QR_CODES[(url, scale)] = qr_buffer.getvalue()
+            qr_buffer.close()
+            try:
+                tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+                with open(tmp_file, "w", encoding="utf8") as f:
+                    f.write(QR_CODES[(url, scale)])
+                os.replace(tmp_file, cache_file)
+            except OSError:
+                pass
+
+    return {u: QR_CODES[(u, scale)] for u in urls}
+
+
+def get_qr_url(metadata, score_type, qr_base_url=None):
+    """Get the URL of a score PDF in the current release."""
+    if qr_base_url is None:
+        qr_base_url = (f"https://github.com/{metadata['repository']}/"
+                       f"releases/download/{metadata['version']}")
+    return f"{qr_base_url}/{score_type}.pdf"
+
+
+
 # Prepare metadata --------------------------------------------------------
 
+YAML_CACHE = {}
+
+def load_yaml(file):
+    """Load a YAML file. The parsed data are kept in YAML_CACHE
+       as long as the file is unchanged."""
+    import strictyaml # pylint: disable=import-outside-toplevel
+
+    key = os.path.realpath(file)
+    signature = file_signature(key)
+    cached = YAML_CACHE.get(key)
+    if cached is None or cached["signature"] != signature:
+        with open(file, encoding="utf8") as f:
+            cached = {"signature": signature,
+                      "data": strictyaml.load(f.read()).data}
+        YAML_CACHE[key] = cached
+    return copy.deepcopy(cached["data"])
+
+
 def get_score_type(abbr, parts):
     """Derive the score type shown on the title page
        from the score type abbreviation."""
@@ -164,7 +579,7 @@ def get_score_type(abbr, parts):
 
     try:
         abbr_bare, number = re.match(r"(\D+)(\d*)", abbr).groups()
-        name = INSTRUMENT_METADATA.loc[abbr_bare, "score_type"]
+        name = INSTRUMENT_METADATA[abbr_bare]["score_type"]
         number = arabic_to_roman(number)
         return f"{name} {number}".strip()
     except (KeyError, AttributeError):
@@ -174,30 +589,14 @@ def get_score_type(abbr, parts):
 def get_abbr(a):
     """Get the long form of a scoring abbreviation."""
     try:
-        res = INSTRUMENT_METADATA.loc[a, "long"]
+        res = INSTRUMENT_METADATA[a]["long"]
     except KeyError:
         error_exit(f"Abbreviation {a} unknown.")
     return res
 
 
-def parse_metadata(file=None,
-                   string=None,
-                   score_type="draft",
-                   checksum_from="tag",
-                   check_license=True,
-                   license_directory=".",
-                   qr_base_url=None):
-    """Parse metadata."""
-    if file is not None:
-        with open(file, encoding="utf8") as f:
-            yaml_data = f.read()
-    elif string is not None:
-        yaml_data = string
-    else:
-        error_exit("No metadata specified.")
-    metadata = strictyaml.load(yaml_data).data
-
-    ## Names
+def add_composer_defaults(metadata):
+    """Add missing composer names."""
     # The `composer` key is optional to accomodate collections of works.
     # The `first` subkey is optional to accomodate anonymous works.
 
@@ -208,110 +607,141 @@ def parse_metadata(file=None,
     if "suffix" not in metadata["composer"]:
         metadata["composer"]["suffix"] = ""
 
-    ## Score type
-    # The score type depends on the value of `-t` and is either set to "Draft",
-    # "Full Score", or the respective part as specified in the
-    # instrument metadata. Can be overridden by the `parts` key.
-    # Roman numbers are automatically appended.
-
-    if "parts" not in metadata:
-        metadata["parts"] = None
-    metadata["score_type"] = get_score_type(score_type, metadata["parts"])
 
-    ## Repository
+def get_repository_metadata(repo_directory, checksum_from):
+    """Get repository name, version, date, and checksum from git."""
     # The name of the remote repository "origin" is read from the git metadata,
     # as are the version, date, and SHA1 of HEAD or the most recent tag.
     # In the former case, set version to "work in progress".
 
-    if checksum_from is not None:
-        github_repo = re.search("github\\.com.(.+)", Repo(".").remotes.origin.url)
-        if github_repo is None:
-            error_exit("URL of origin repository has unknown format.")
-        metadata["repository"] = github_repo.group(1).removesuffix(".git")
-
-        if checksum_from == "tag":
-            if Repo(".").tags:
-                metadata["version"] = Repo(".").tags[-1].name
-                commit = Repo(".").tags[-1].commit
-            else:
-                error_exit("ERROR: No tag found – unable to retrieve metadata.")
+    res = {}
+    git_info = get_git_info(repo_directory)
+    if git_info["origin_url"] is None:
+        error_exit("No remote repository 'origin' found.")
+    github_repo = re.search("github\\.com.(.+)", git_info["origin_url"])
+    if github_repo is None:
+        error_exit("URL of origin repository has unknown format.")
+    res["repository"] = github_repo.group(1).removesuffix(".git")
+
+    if checksum_from == "tag":
+        if git_info["tag"] is not None:
+            res["version"] = git_info["tag"]["name"]
+            commit = git_info["tag"]
         else:
-            metadata["version"] = "work in progress"
-            commit = Repo(".").head.commit
-        metadata["date"] = commit.committed_datetime.strftime("%Y-%m-%d")
-        metadata["checksum"] = commit.hexsha
-
-    ## LilyPond version
-    # The LilyPond version is obtained from the executable.
-    # If LilyPond is not installed, display an appropriate string.
+            error_exit("ERROR: No tag found – unable to retrieve metadata.")
+    else:
+        res["version"] = "work in progress"
+        commit = git_info["head"]
+    res["date"] = commit["date"]
+    res["checksum"] = commit["checksum"]
+    return res
 
-    try:
-        lilypond_version = subprocess.run(
-            ["lilypond", "--version"],
-            capture_output=True,
-            text=True,
-            check=False
-        ).stdout
-        metadata["lilypond_version"] = re.search(
-            r"GNU LilyPond ([^\s]+)",
-            lilypond_version
-        ).group(1)
-    except FileNotFoundError:
-        metadata["lilypond_version"] = "(not available)"
 
-    ## EES Tools version
-    # This version is obtained from the most recent tag of the repository
-    # in $EES_TOOLS_PATH.
+def format_table_sources(sources):
+    """Formats edition sources for display in a table."""
+    res = []
+    for source_id, details in sources.items():
+        if "principal" in details and details["principal"]:
+            p = ", principal"
+        else:
+            p = ""
+        res.append(f"{source_id} ({details['siglum']} "
+                   f"{details['shelfmark']}{p})")
+    return "".join(res)
 
-    metadata["eestools_version"] = Repo(EES_TOOLS_PATH).tags[-1].name
 
-    ## QR Code
-    # It will contain a link to the PDF in the current release.
+def parse_metadata(file=None,
+                   string=None,
+                   score_type="draft",
+                   checksum_from="tag",
+                   check_license=True,
+                   license_directory=".",
+                   qr_base_url=None,
+                   repo_directory="."):
+    """Parse metadata. If score_type is None, only the metadata shared
+       by all score types is returned (see set_score_type())."""
+    with PROFILER.phase("yaml"):
+        if file is not None:
+            metadata = load_yaml(file)
+        elif string is not None:
+            import strictyaml # pylint: disable=import-outside-toplevel
+            metadata = strictyaml.load(string).data
+        else:
+            error_exit("No metadata specified.")
 
-    if score_type == "draft":
-        metadata["qr_code"] = ""
-    else:
-        if qr_base_url is None:
-            qr_base_url = (f"https://github.com/{metadata['repository']}/"
-                           f"releases/download/{metadata['version']}")
-        qr_url = f"{qr_base_url}/{score_type}.pdf"
-        qr_buffer = io.StringIO()
-        segno.make_qr(qr_url).save(qr_buffer, kind="tex", scale=1.5, url=qr_url)
-        metadata["qr_code"] = qr_buffer.getvalue()
-        qr_buffer.close()
+    ## Names
+    add_composer_defaults(metadata)
 
+    if "parts" not in metadata:
+        metadata["parts"] = None
 
-    ## Sources
-    # For each entry in `sources`, add missing date, RISM information
-    # and notes, and determine the identifier of the principal source.
+    ## Repository
+    if checksum_from is not None:
+        with PROFILER.phase("git"):
+            metadata.update(
+                get_repository_metadata(repo_directory, checksum_from)
+            )
 
-    source_items = []
-    for source_id, info in metadata["sources"].items():
-        info["category"] = SOURCE_CATEGORIES[source_id[0]]
+    ## Toolchain versions
+    # The LilyPond, LuaLaTeX, and latexmk versions are obtained
+    # from the executables. If a program is not installed,
+    # display an appropriate string.
 
-        if "date" not in info or info["date"] == "":
-            info["date"] = ""
+    with PROFILER.phase("toolchain"):
+        metadata["lilypond_version"] = get_tool_version("lilypond")
+        metadata["lualatex_version"] = get_tool_version("lualatex")
+        metadata["latexmk_version"] = get_tool_version("latexmk")
 
-        if "rism" not in info or info["rism"] == "":
-            info["rism"] = ""
+    ## EES Tools version
+    # This version is obtained from the most recent tag of the repository
+    # in $EES_TOOLS_PATH.
 
-        if "notes" not in info or info["notes"] == "":
-            info["notes"] = ""
+    with PROFILER.phase("eestools_version"):
+        eestools_tag = get_git_info(EES_TOOLS_PATH or ".")["tag"]
+        if eestools_tag is None:
+            error_exit("No tag found in the EES Tools repository.")
+        metadata["eestools_version"] = eestools_tag["name"]
 
-        if "url" not in info or info["url"] == "":
-            info["url"] = ""
+    ## Sources
+    # For each entry in `sources`, add missing date, RISM information
+    # and notes, and determine the identifier of the principal source.
 
-        if "principal" in info and info["principal"]:
-            if "principal_id" in metadata:
-                error_exit("Exactly one source must be marked as principal.")
-            info["category"] = PRINCIPAL_SRC_TEMPLATE.format(info["category"])
-            metadata["principal_id"] = PRINCIPAL_ID_TEMPLATE.format(
-                info["siglum"], info["shelfmark"]
+    with PROFILER.phase("sources"):
+        source_items = []
+        for source_id, info in metadata["sources"].items():
+            info["category"] = SOURCE_CATEGORIES[source_id[0]]
+
+            if "date" not in info or info["date"] == "":
+                info["date"] = ""
+
+            if "rism" not in info or info["rism"] == "":
+                info["rism"] = ""
+
+            if "notes" not in info or info["notes"] == "":
+                info["notes"] = ""
+
+            if "url" not in info or info["url"] == "":
+                info["url"] = ""
+
+            if "principal" in info and info["principal"]:
+                if "principal_id" in metadata:
+                    error_exit(
+                        "Exactly one source must be marked as principal."
+                    )
+                info["category"] = PRINCIPAL_SRC_TEMPLATE.format(
+                    info["category"]
+                )
+                metadata["principal_id"] = PRINCIPAL_ID_TEMPLATE.format(
+                    info["siglum"], info["shelfmark"]
+                )
+
+            source_items.append(
+                SOURCE_ITEM_TEMPLATE.format(id=source_id, **info)
             )
 
-        source_items.append(SOURCE_ITEM_TEMPLATE.format(id=source_id, **info))
-
-    metadata["sources_env"] = SOURCES_TEMPLATE.format("\n".join(source_items))
+        metadata["sources_env"] = SOURCES_TEMPLATE.format(
+            "\n".join(source_items)
+        )
 
     ## Subtitle
     # The subtitle consists of the value of the `subtitle` key (if available)
@@ -337,30 +767,32 @@ def parse_metadata(file=None,
     # instrument may be surrounded by brackets or end with the pitch
     # in parentheses, these elements are removed.
 
-    abbr = DEFAULT_ABBR
-    if "extra_abbreviations" in metadata:
-        for a, long in metadata["extra_abbreviations"].items():
-            if long == "":
+    with PROFILER.phase("abbreviations"):
+        abbr = DEFAULT_ABBR.copy()
+        if "extra_abbreviations" in metadata:
+            for a, long in metadata["extra_abbreviations"].items():
+                if long == "":
+                    abbr[a] = get_abbr(a)
+                else:
+                    abbr[a] = long
+
+        for a in (metadata["scoring"]
+                  .replace("\\newline", "")
+                  .replace("\\\\", "")
+                  .split(",")):
+            a = a.strip(" \n")
+            if a[0] == "[":
+                a = a[1:-1]
+            if a[-1] == ")":
+                a = re.match(r"[^\(]+", a).group(0).strip()
+            a = a.lstrip("0123456789 ").removesuffix("solo").rstrip()
+            if a not in abbr:
                 abbr[a] = get_abbr(a)
-            else:
-                abbr[a] = long
-
-    for a in (metadata["scoring"]
-              .replace("\\newline", "")
-              .replace("\\\\", "")
-              .split(",")):
-        a = a.strip(" \n")
-        if a[0] == "[":
-            a = a[1:-1]
-        if a[-1] == ")":
-            a = re.match(r"[^\(]+", a).group(0).strip()
-        a = a.lstrip("0123456789 ").removesuffix("solo").rstrip()
-        if a not in abbr:
-            abbr[a] = get_abbr(a)
-
-    abbr_items = [ABBR_ITEM_TEMPLATE.format(short=k, long=v)
-                  for k, v in sorted(abbr.items(), key=lambda x: x[0].lower())]
-    metadata["abbr_env"] = ABBR_TEMPLATE.format("\n  ".join(abbr_items))
+
+        abbr_items = [ABBR_ITEM_TEMPLATE.format(short=k, long=v)
+                      for k, v in sorted(abbr.items(),
+                                         key=lambda x: x[0].lower())]
+        metadata["abbr_env"] = ABBR_TEMPLATE.format("\n  ".join(abbr_items))
 
     ## Editor
     # set a default editor
@@ -371,39 +803,148 @@ def parse_metadata(file=None,
     # Check whether the license key (a) exists, (b) has a known value, and
     # (c) correponds to the LICENSE file (optionally).
 
-    if "license" not in metadata:
-        error_exit("Key 'license' missing.")
-    if metadata["license"] not in LICENSE_HEADINGS:
-        error_exit(f'Unknown license: {metadata["license"]}')
+    with PROFILER.phase("license"):
+        if "license" not in metadata:
+            error_exit("Key 'license' missing.")
+        if metadata["license"] not in LICENSE_HEADINGS:
+            error_exit(f'Unknown license: {metadata["license"]}')
 
-    if check_license:
-        try:
-            with open(os.path.join(license_directory, "LICENSE"),
-                      encoding="utf8") as f:
-                license_heading = f.readline().strip()
-        except FileNotFoundError:
-            error_exit("No LICENSE file found.")
-        if license_heading != LICENSE_HEADINGS[metadata["license"]]:
-            error_exit("LICENSE does not match the 'license' key.")
+        if check_license:
+            try:
+                with open(os.path.join(license_directory, "LICENSE"),
+                          encoding="utf8") as f:
+                    license_heading = f.readline().strip()
+            except FileNotFoundError:
+                error_exit("No LICENSE file found.")
+            if license_heading != LICENSE_HEADINGS[metadata["license"]]:
+                error_exit("LICENSE does not match the 'license' key.")
 
+    if score_type is not None:
+        metadata = set_score_type(metadata, score_type, qr_base_url)
     return metadata
 
 
+def parse_catalog_metadata(file, repo_directory="."):
+    """Parse only the metadata required for the table (INCLUDED_COLUMNS).
+       In contrast to parse_metadata(), neither LaTeX code nor QR codes
+       are generated, and no external programs are run."""
+    with PROFILER.phase("yaml"):
+        metadata = load_yaml(file)
+    add_composer_defaults(metadata)
+    with PROFILER.phase("git"):
+        metadata.update(get_repository_metadata(repo_directory, "tag"))
+
+    with PROFILER.phase("sources"):
+        principal_ids = [
+            PRINCIPAL_ID_TEMPLATE.format(info["siglum"], info["shelfmark"])
+            for info in metadata["sources"].values()
+            if "principal" in info and info["principal"]
+        ]
+        if len(principal_ids) > 1:
+            error_exit("Exactly one source must be marked as principal.")
+        if not principal_ids:
+            error_exit("No principal source specified.")
+
+        if "id" not in metadata or metadata["id"] == "":
+            metadata["id"] = principal_ids[0]
+
+        metadata["sources"] = format_table_sources(metadata["sources"])
+    return metadata
 
-# Dispatcher functions ----------------------------------------------------
 
-def prepare_edition(args):
-    """Collects metadata for an edition."""
-    metadata = parse_metadata(
-        file=args.input,
-        score_type=args.type,
-        checksum_from=args.checksum_from,
-        license_directory=args.license_directory,
-        qr_base_url=args.qr_base_url
-    )
+def set_score_type(metadata, score_type, qr_base_url=None):
+    """Add the metadata that depend on the score type
+       to a copy of the shared metadata."""
+    metadata = metadata.copy()
+
+    ## Score type
+    # The score type depends on the value of `-t` and is either set to "Draft",
+    # "Full Score", or the respective part as specified in the
+    # instrument metadata. Can be overridden by the `parts` key.
+    # Roman numbers are automatically appended.
+
+    with PROFILER.phase("score_type"):
+        metadata["score_type"] = get_score_type(score_type, metadata["parts"])
+
+    ## QR Code
+    # It will contain a link to the PDF in the current release.
+
+    if score_type == "draft":
+        metadata["qr_code"] = ""
+    else:
+        qr_url = get_qr_url(metadata, score_type, qr_base_url)
+        with PROFILER.phase("qr_code"):
+            metadata["qr_code"] = make_qr_codes([qr_url])[qr_url]
+
+    return metadata
+
+
+
+# Catalog cache -----------------------------------------------------------
+# The catalog cache stores the table row of each work together with the
+# size, mtime, and SHA256 hash of its metadata.yaml and the fingerprint
+# of its git refs. One JSON record is saved per line.
+
+def work_signature(work_dir):
+    """Return size and mtime of the metadata file of a work and the
+       fingerprint of its git refs, or None if there is no metadata."""
+    signature = file_signature(os.path.join(work_dir, "metadata.yaml"))
+    if signature is None:
+        return None
+    git_dir = find_git_dir(work_dir)
+    signature["git"] = git_fingerprint(git_dir) if git_dir else None
+    return signature
+
+
+def load_catalog_cache(cache_file):
+    """Load the catalog cache as a dict folder -> record."""
+    records = {}
+    try:
+        with open(cache_file, encoding="utf8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record["folder"]] = record
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def save_catalog_cache(cache_file, records):
+    """Save the catalog cache, replacing the old file atomically."""
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w", encoding="utf8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_file, cache_file)
+
+
+def lookup_catalog_cache(cache, work_dir, signature):
+    """Return the cached record of a work if its metadata is unchanged."""
+    record = cache.get(work_dir)
+    if (record is None
+        or record.get("version") != CATALOG_CACHE_VERSION
+        or record.get("git") != signature["git"]):
+        return None
+    if (record["size"] == signature["size"] and
+        record["mtime_ns"] == signature["mtime_ns"]):
+        return record
 
-    # assemble macros
-    if args.type in ("draft", "full_score"):
+    # the file was touched: compare contents
+    sha256 = file_hash(os.path.join(work_dir, "metadata.yaml"))
+    if record["sha256"] == sha256:
+        return record | signature
+    return None
+
+
+
+# Dispatcher functions ----------------------------------------------------
+
+def make_macros(metadata, score_type, additional_keys, score_directory):
+    """Assemble the LaTeX macros for a score type."""
+    if score_type in ("draft", "full_score"):
         macros_conditionals = "\\PrintFrontMattertrue\n"
     else:
         macros_conditionals = "\\PrintFrontMatterfalse\n"
@@ -412,66 +953,344 @@ def prepare_edition(args):
 
     macros_additional_keys = "\n".join([
         ADDITIONAL_METADATA_TEMPLATE.format(key=k.title(), value=metadata[k])
-        for k in args.additional_keys
+        for k in additional_keys
         if k in metadata
     ])
 
-    if args.type == "draft":
+    if score_type == "draft":
         macros_scores = ""
     else:
         macros_scores = PRINT_SCORE_TEMPLATE.format(
-            type=args.type, score_dir=args.score_directory
+            type=score_type, score_dir=score_directory
         )
 
-    # save macros
-    with open(args.output, "w", encoding="utf8") as f:
-        f.writelines(macros_conditionals)
-        f.writelines(macros_metadata)
-        f.writelines(macros_additional_keys)
-        f.writelines(macros_scores)
+    return (macros_conditionals + macros_metadata +
+            macros_additional_keys + macros_scores)
 
 
-def format_table_sources(sources):
-    """Formats edition sources for display in a table."""
-    res = []
-    for source_id, details in sources.items():
-        if "principal" in details and details["principal"]:
-            p = ", principal"
+def get_macro_values(metadata, additional_keys):
+    """Get the values of the metadata macros as a dict, whose keys are
+       the macro names without prefix 'Metadata' (e.g., 'Title')."""
+    values = {name: ("{" + field + "}").format(**metadata)
+              for name, field in METADATA_FIELDS}
+    for k in additional_keys:
+        if k in metadata:
+            values[k.title()] = str(metadata[k])
+    return values
+
+
+def find_score_types(score_directory="scores"):
+    """Find all score types defined in the scores folder."""
+    try:
+        return sorted(os.path.splitext(f)[0]
+                      for f in os.listdir(score_directory)
+                      if f.endswith(".ly"))
+    except FileNotFoundError:
+        error_exit(f"Folder '{score_directory}' not found.")
+
+
+def prepare_edition(args):
+    """Collects metadata for an edition."""
+    if args.via_socket is not None and request_via_socket(args):
+        return
+    start = time.perf_counter()
+    PROFILER.enabled = args.profile is not None
+
+    # determine score types and output files
+    if args.types is None:
+        score_types = [args.type]
+        output = args.output or DEFAULT_MACROS_FILE
+    else:
+        if args.types == ["all"]:
+            score_types = find_score_types()
         else:
-            p = ""
-        res.append(f"{source_id} ({details['siglum']} "
-                   f"{details['shelfmark']}{p})")
-    return "".join(res)
+            score_types = args.types
+        output = args.output or DEFAULT_MACROS_FILE_PER_TYPE
+        if len(score_types) > 1 and "{type}" not in output:
+            error_exit("The output file must contain '{type}' "
+                       "if several score types are selected.")
 
+    # parse shared metadata only once
+    metadata = parse_metadata(
+        file=args.input,
+        score_type=None,
+        checksum_from=args.checksum_from,
+        license_directory=args.license_directory
+    )
 
-def prepare_table(args):
-    """Collects metadata for a table."""
-    # read metadata files
-    works = []
-    for composer_dir in os.listdir(args.root_directory):
-        full_composer_dir = os.path.join(args.root_directory, composer_dir)
+    # encode all QR codes in one batch
+    with PROFILER.phase("qr_code"):
+        make_qr_codes([get_qr_url(metadata, t, args.qr_base_url)
+                       for t in score_types if t != "draft"])
+
+    # assemble and save macros for each score type
+    for score_type in score_types:
+        typed_metadata = set_score_type(metadata, score_type,
+                                        args.qr_base_url)
+        with PROFILER.phase("macros"):
+            macros = make_macros(
+                typed_metadata,
+                score_type,
+                args.additional_keys,
+                args.score_directory
+            )
+        with PROFILER.phase("write"):
+            # scores in subfolders (e.g., 'choir/soprano') have their
+            # macros in the same subfolder, where ees.cls looks for
+            # \jobname.macros
+            output_file = output.format(type=score_type)
+            output_dir = os.path.dirname(output_file)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            with open(output_file, "w", encoding="utf8") as f:
+                f.write(macros)
+            if args.sidecar:
+                values = get_macro_values(typed_metadata,
+                                          args.additional_keys)
+                with open(output_file + ".json", "w",
+                          encoding="utf8") as f:
+                    json.dump(values, f, indent=2, ensure_ascii=False)
+
+    if PROFILER.enabled:
+        write_profile(args, "edition", start)
+
+
+def parse_work(work_dir, profile=False):
+    """Parse the metadata of a single work for the table.
+       Returns a tuple (metadata, error message, profiled phases)."""
+    output = io.StringIO()
+    PROFILER.enabled = profile
+    try:
+        with contextlib.redirect_stdout(output):
+            metadata = parse_catalog_metadata(
+                os.path.join(work_dir, "metadata.yaml"),
+                repo_directory=work_dir
+            )
+    except FileNotFoundError:
+        return None, "No metadata found", PROFILER.reset()
+    # error_exit() raises SystemExit, which must not end the whole run
+    except (Exception, SystemExit) as e: # pylint: disable=broad-exception-caught
+        return (None,
+                output.getvalue().strip() or f"{type(e).__name__}: {e}",
+                PROFILER.reset())
+
+    metadata["folder"] = work_dir
+    return metadata, None, PROFILER.reset()
+
+
+def find_work_dirs(root_directory):
+    """Find all work folders below ROOT in a deterministic order."""
+    work_dirs = []
+    for composer_dir in sorted(os.listdir(root_directory)):
+        full_composer_dir = os.path.join(root_directory, composer_dir)
         if (not os.path.isdir(full_composer_dir) or
+            composer_dir.startswith(".") or
             composer_dir in IGNORED_COMPOSER_DIRS):
             continue
-        for work_dir in os.listdir(full_composer_dir):
+        for work_dir in sorted(os.listdir(full_composer_dir)):
             full_work_dir = os.path.join(full_composer_dir, work_dir)
-            if not os.path.isdir(full_work_dir):
-                continue
-            try:
-                f = os.path.join(full_work_dir, "metadata.yaml")
-                metadata = parse_metadata(file=f, check_license=False)
-            except FileNotFoundError:
-                print("WARNING: No metadata found in", full_work_dir)
+            if os.path.isdir(full_work_dir):
+                work_dirs.append(full_work_dir)
+    return work_dirs
+
+
+def table_row(metadata):
+    """Flatten metadata of a work into a table row (nested keys are
+       joined by '_') and restrict it to INCLUDED_COLUMNS."""
+    flat = {}
+
+    def flatten(d, prefix):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                flatten(v, f"{prefix}{k}_")
+            else:
+                flat[f"{prefix}{k}"] = v
+
+    flatten(metadata, "")
+    return {k: flat[k] for k in INCLUDED_COLUMNS if k in flat}
+
+
+
+def prepare_table(args):
+    """Collects metadata for a table."""
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+    from pandas import DataFrame
+
+    start = time.perf_counter()
+    profile = args.profile is not None
+    PROFILER.enabled = profile
+    if args.no_cache:
+        cache_file = None
+        cache = {}
+    else:
+        cache_file = args.cache or os.path.join(args.root_directory,
+                                                CATALOG_CACHE_FILE)
+        cache = load_catalog_cache(cache_file)
+
+    # find works and reuse rows of unchanged works from the cache
+    records = {}
+    stale_dirs = []
+    with PROFILER.phase("scan"):
+        for work_dir in find_work_dirs(args.root_directory):
+            signature = work_signature(work_dir)
+            if signature is None:
+                print(f"WARNING: No metadata found in {work_dir}")
                 continue
-            metadata["folder"] = full_work_dir
-            metadata["sources"] = format_table_sources(metadata["sources"])
-            works.append(metadata)
+            record = lookup_catalog_cache(cache, work_dir, signature)
+            if record is None:
+                stale_dirs.append(work_dir)
+            else:
+                records[work_dir] = record
+    n_reused = len(records)
+    table_phases = PROFILER.reset()
+
+    # read metadata files of new or changed works
+    # (the profiling flag is passed explicitly since worker processes
+    # do not necessarily inherit the state of this process)
+    if args.jobs > 1 and len(stale_dirs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(parse_work, stale_dirs,
+                                        itertools.repeat(profile),
+                                        chunksize=4))
+    else:
+        results = [parse_work(d, profile) for d in stale_dirs]
+    PROFILER.enabled = profile
+
+    work_phases = {}
+    for work_dir, (metadata, error, phases) in zip(stale_dirs, results):
+        work_phases[work_dir] = phases
+        if error is not None:
+            print(f"WARNING: {error} in {work_dir}")
+            continue
+        records[work_dir] = {
+            "version": CATALOG_CACHE_VERSION,
+            "folder": work_dir,
+            **work_signature(work_dir),
+            "sha256": file_hash(os.path.join(work_dir, "metadata.yaml")),
+            "row": table_row(metadata)
+        }
+
+    # deleted works are dropped from the cache since only
+    # records of existing works are saved
+    if cache_file is not None:
+        save_catalog_cache(cache_file,
+                           [records[k] for k in sorted(records)])
+    print(f"Parsed {len(stale_dirs)} works, "
+          f"reused {n_reused} works from the catalog cache.")
+
+    # save as CSV
+    with PROFILER.phase("csv"):
+        df = (DataFrame([records[k]["row"] for k in sorted(records)])
+              .sort_values(["composer_last", "title"]))
+        df[INCLUDED_COLUMNS].to_csv(args.output, index=False)
+
+    if profile:
+        # the phases of all works are summed up for the overall record
+        PROFILER.add(table_phases)
+        for phases in work_phases.values():
+            PROFILER.add(phases)
+        write_profile(args, "table", start, works=work_phases)
+
+
+
+# Metadata server ---------------------------------------------------------
+# The subcommand `serve` keeps a process with warm caches (git metadata,
+# toolchain versions, instrument data, parsed YAML files, QR codes)
+# listening on a UNIX domain socket. `edition --via-socket` sends its
+# arguments as a single JSON line and receives a JSON line with the exit
+# status and the output. Caches are validated against the files they
+# depend on for each request.
+
+class MetadataRequestHandler(socketserver.StreamRequestHandler):
+    """Process a single request to the metadata server."""
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        args = argparse.Namespace(**request["args"])
+        args.via_socket = None
+
+        output = io.StringIO()
+        status = 0
+        # the server processes one request at a time, so it may work in
+        # the client's folder as long as it changes back afterwards
+        server_dir = os.getcwd()
+        try:
+            os.chdir(request["cwd"])
+            load_instrument_metadata()
+            with contextlib.redirect_stdout(output):
+                prepare_edition(args)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e: # pylint: disable=broad-exception-caught
+            output.write(f"ERROR: {type(e).__name__}: {e}\n")
+            status = 1
+        finally:
+            os.chdir(server_dir)
+
+        response = {"status": status, "output": output.getvalue()}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+def request_via_socket(args):
+    """Let the metadata server process the edition subcommand.
+       Returns False if the server is not available."""
+    request = {"cwd": os.getcwd(),
+               "args": {k: v for k, v in vars(args).items() if k != "func"}}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(SOCKET_TIMEOUT)
+            sock.connect(args.via_socket)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+        status, output = response["status"], response["output"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # e.g., no server, a non-socket file, or no (valid) response
+        print(f"WARNING: No response from metadata server at "
+              f"{args.via_socket} ({e}), processing locally")
+        return False
+
+    print(output, end="")
+    if status != 0:
+        sys.exit(status)
+    return True
+
+
+def remove_socket(file):
+    """Remove a UNIX domain socket, but no other kind of file.
+       Returns False if the file exists and is not a socket."""
+    try:
+        if not stat.S_ISSOCK(os.lstat(file).st_mode):
+            return False
+        os.remove(file)
+    except FileNotFoundError:
+        pass
+    return True
 
 
-    # normalize and save as CSV
-    df = (json_normalize(works, sep="_")
-          .sort_values(["composer_last", "title"]))
-    df[INCLUDED_COLUMNS].to_csv(args.output, index=False)
+def serve_metadata(args):
+    """Run the metadata server."""
+    # requests change the working directory temporarily
+    args.socket = os.path.abspath(args.socket)
+    os.makedirs(os.path.dirname(args.socket), exist_ok=True)
+    if not remove_socket(args.socket):
+        error_exit(f"'{args.socket}' exists and is not a socket.")
+
+    print(f"Serving metadata on {args.socket}")
+    try:
+        with socketserver.UnixStreamServer(args.socket,
+                                           MetadataRequestHandler) as server:
+            # exit cleanly (i.e., remove the socket) on SIGTERM after the
+            # current request; shutdown() blocks until serve_forever()
+            # returns and must therefore run in another thread
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(
+                target=server.shutdown, daemon=True).start())
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remove_socket(args.socket)
 
 
 
@@ -496,12 +1315,14 @@ if __name__ == "__main__":
     parser_edition.add_argument(
         "-o",
         "--output",
-        default="front_matter/critical_report.macros",
-        help="""write the macros to FILE
-                (default: 'front_matter/critical_report.macros')""",
+        default=None,
+        help=f"""write the macros to FILE; '{{type}}' is replaced by the
+                score type (default: '{DEFAULT_MACROS_FILE}', or
+                '{DEFAULT_MACROS_FILE_PER_TYPE}' if --types is given)""",
         metavar="FILE"
     )
-    parser_edition.add_argument(
+    edition_types = parser_edition.add_mutually_exclusive_group()
+    edition_types.add_argument(
         "-t",
         "--type",
         default="draft",
@@ -509,6 +1330,15 @@ if __name__ == "__main__":
                 ('full_score', 'draft', or part name;
                 default: 'draft')"""
     )
+    edition_types.add_argument(
+        "--types",
+        nargs="+",
+        default=None,
+        help="""write front matter macros for each of these score TYPES,
+                parsing the metadata only once ('all' selects all scores
+                in folder 'scores')""",
+        metavar="TYPES"
+    )
     parser_edition.add_argument(
         "-c",
         "--checksum-from",
@@ -547,6 +1377,31 @@ if __name__ == "__main__":
                 (default: current GitHub release)""",
         metavar="URL"
     )
+    parser_edition.add_argument(
+        "--sidecar",
+        action="store_true",
+        help="""also write the values of all macros to a JSON file
+                (name of the macros file + '.json')"""
+    )
+    parser_edition.add_argument(
+        "--via-socket",
+        nargs="?",
+        const=DEFAULT_SOCKET,
+        default=None,
+        help=f"""let the metadata server listening on SOCKET create the
+                macros (default: {DEFAULT_SOCKET}); process locally if
+                the server is not available""",
+        metavar="SOCKET"
+    )
+    parser_edition.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        help="""record the time spent in each phase and print it as
+                JSON or append it as a JSON line to FILE""",
+        metavar="FILE"
+    )
     parser_edition.set_defaults(func=prepare_edition)
 
     parser_table = subparsers.add_parser("table")
@@ -566,7 +1421,47 @@ if __name__ == "__main__":
         help="write the table to FILE (default: 'works.csv')",
         metavar="FILE"
     )
+    parser_table.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="parse metadata of N works in parallel (default: 1)",
+        metavar="N"
+    )
+    parser_table.add_argument(
+        "--cache",
+        default=None,
+        help=f"""store parsed metadata in this FILE and only parse new or
+                changed works (default: ROOT/{CATALOG_CACHE_FILE})""",
+        metavar="FILE"
+    )
+    parser_table.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="parse all works and do not use the catalog cache"
+    )
+    parser_table.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        help="""record the time spent in each phase (for each work) and
+                print it as JSON or append it as a JSON line to FILE""",
+        metavar="FILE"
+    )
     parser_table.set_defaults(func=prepare_table)
 
+    parser_serve = subparsers.add_parser("serve")
+    parser_serve.add_argument(
+        "-S",
+        "--socket",
+        default=DEFAULT_SOCKET,
+        help=f"""listen on this UNIX domain SOCKET
+                (default: {DEFAULT_SOCKET})""",
+        metavar="SOCKET"
+    )
+    parser_serve.set_defaults(func=serve_metadata)
+
     parsed_args = parser.parse_args()
     parsed_args.func(parsed_args)
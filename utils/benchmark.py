@@ -0,0 +1,835 @@
+#!/bin/python
+
+"""Benchmark EES Tools on a synthetic corpus of works."""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+
+# Corpus templates --------------------------------------------------------
+
+COMPOSERS = ["Werner", "Eybler", "Haydn", "Fux", "Reutter", "Caldara",
+             "Tuma", "Zelenka", "Bonno", "Albrechtsberger"]
+
+MOVEMENTS = ["Kyrie", "Gloria", "Credo", "Sanctus", "Benedictus",
+             "AgnusDei", "Graduale", "Offertorium", "Magnificat",
+             "Laudate"]
+
+PARTS = {  # score type -> (notes file, LilyPond variable suffix)
+    "ob1": ("ob", "OboeI"),
+    "ob2": ("ob", "OboeII"),
+    "clno1": ("clno", "ClarinoI"),
+    "clno2": ("clno", "ClarinoII"),
+    "timp": ("timp", "Timpani"),
+    "vl1": ("vl1", "ViolinoI"),
+    "vl2": ("vl2", "ViolinoII"),
+    "vla": ("vla", "Viola"),
+    "coro": ("coro", "Soprano"),
+    "org": ("org", "Organo")
+}
+
+SCORING = "S, A, T, B, coro, 2 ob, 2 clno, timp, 2 vl, vla, b, org"
+
+METADATA_TEMPLATE = """\
+composer:
+  first: Gregor Joseph
+  last: {composer}
+title: Missa {number}
+subtitle: in C
+id: {composer_short} {number}
+genre: Mass
+festival: Dominica {number}
+scoring: {scoring}
+license: cc-by-sa-4.0
+imslp: ""
+notes: ""
+toe: |
+  1 & vl 1 & ♩ e'' instead of d'' \\\\
+  2 & org & figure 6 missing \\\\
+lyrics: Kyrie eleison.
+sources:
+  A1:
+    siglum: A-Wn
+    shelfmark: Mus.Hs.{number}
+    date: 1765
+    license: CC-BY
+    principal: true
+  B1:
+    siglum: D-Dl
+    shelfmark: Mus.{number}-D-1
+    license: CC-BY-SA
+"""
+
+LICENSE_HEADING = "Attribution-ShareAlike 4.0 International"
+
+DEFINITIONS_TEMPLATE = """\
+\\version "2.24.2"
+
+\\include "ees.ly"
+
+{includes}
+"""
+
+NOTES_TEMPLATE = """
+{movement}{variable} = {{
+  \\relative c' {{
+    \\clef treble
+    \\key c \\major \\time 4/4 \\tempo{movement}
+    {music}
+  }}
+}}
+"""
+
+FULL_SCORE_TEMPLATE = """\
+\\version "2.24.2"
+
+\\include "../definitions.ly"
+\\include "score_settings/full-score.ly"
+
+\\paper {{
+  indent = 1\\cm
+  system-system-spacing.basic-distance = #20
+}}
+
+\\book {{
+{bookparts}}}
+"""
+
+BOOKPART_TEMPLATE = """\
+  \\bookpart {{
+    \\section "{number}" "{movement}"
+    \\addTocEntry
+    \\paper {{ indent = 2\\cm }}
+    \\score {{
+      <<
+{staves}
+      >>
+      \\layout {{ }}
+      \\midi {{ \\tempo 4 = 90 }}
+    }}
+  }}
+"""
+
+STAFF_TEMPLATE = """\
+        \\new Staff {{
+          \\set Staff.instrumentName = "{part}"
+          \\{movement}{variable}
+        }}"""
+
+PART_TEMPLATE = """\
+\\version "2.24.2"
+
+\\include "../definitions.ly"
+\\include "score_settings/one-staff.ly"
+
+\\book {{
+  \\bookpart {{
+    \\score {{
+      \\new Staff {{ \\{movement}{variable} }}
+    }}
+  }}
+}}
+"""
+
+CRITICAL_REPORT = """\
+\\documentclass{ees}
+
+\\begin{document}
+\\eesTitlePage
+\\eesCriticalReport{}
+\\eesToc{}
+\\eesScore
+\\end{document}
+"""
+
+LY_LOG_HEADER = """\
+GNU LilyPond 2.24.2 (running Guile 2.2)
+Processing `{path}/scores/full_score.ly'
+Parsing...
+"""
+
+LY_LOG_MESSAGES = [
+    """\
+{path}/notes/vl1.ly:{line}:7: warning: barcheck failed at: 1/4
+    c4 d e
+       f |
+""",
+    """\
+{path}/notes/org.ly:{line}:12: warning: unterminated slur
+  c4( d e f
+         g |
+""",
+    "warning: MIDI channel wrapped around\n",
+    "warning: no \\version statement found, please add\n"
+]
+
+LY_LOG_ERROR = """\
+{path}/notes/vla.ly:{line}:3: error: unknown escaped string: `\\foo'
+  c4 \\foo
+     d e f |
+"""
+
+LY_LOG_FILLER = [
+    "Interpreting music...[8][16][24][32][40][48][56][64]\n",
+    "Preprocessing graphical objects...\n",
+    "Interpreting music...[72][80][88][96][104][112][120]\n",
+    "Calculating line breaks... [8][16][24][32]\n",
+    "Drawing systems...\n"
+]
+
+LY_LOG_FOOTER = """\
+Finding the ideal number of pages...
+Fitting music on 12 or 13 pages...
+Converting to `full_score.pdf'...
+Success: compilation successfully completed
+"""
+
+TEX_LOG_HEADER = """\
+This is LuaHBTeX, Version 1.17.0 (TeX Live 2023)  (format=lualatex 2023.10.1)
+ restricted system commands enabled.
+**critical_report.tex
+(./critical_report.tex
+LaTeX2e <2023-06-01> patch level 1
+L3 programming layer <2023-10-10>
+"""
+
+TEX_LOG_MESSAGES = [
+    """\
+LaTeX Warning: Reference `sec:{line}' on page 3 undefined on input line {line}.
+
+""",
+    """\
+Overfull \\hbox ({line}.5pt too wide) in paragraph at lines {line}--{line}
+[]\\TU/LibertinusSerif(0)/m/n/10.95 Kyrie eleison
+ []
+
+""",
+    """\
+Underfull \\vbox (badness 10000) has occurred while \\output is active []
+
+""",
+    """\
+Package hyperref Warning: Token not allowed in a PDF string (Unicode):
+(hyperref)                removing `\\\\' on input line {line}.
+
+"""
+]
+
+TEX_LOG_ERROR = """\
+! Undefined control sequence.
+l.{line} \\foo
+
+"""
+
+TEX_LOG_FILLER = [
+    "(/usr/share/texlive/texmf-dist/tex/latex/pdfpages/pdfpages.sty\n",
+    "Package: pdfpages 2023/09/10 v0.5y Insert pages of external PDF documents\n",
+    "<../tmp/full_score.pdf, id=42, page=7, 597.50787pt x 845.04684pt>\n",
+    "File: ../tmp/full_score.pdf Graphic file (type pdf)\n",
+    "<use ../tmp/full_score.pdf, page 7>\n",
+    "[7 <../tmp/full_score.pdf>]\n",
+    "\\xltabular@width=\\dimen{line}\n"
+]
+
+TEX_LOG_FOOTER = """\
+)
+Output written on critical_report.pdf (42 pages, 123456 bytes).
+"""
+
+STUB_TEMPLATE = """\
+#!/bin/sh
+# offline stub created by benchmark.py
+if [ "$1" = "--version" ]; then
+  echo "{version}"
+  exit 0
+fi
+echo "Success: compilation successfully completed" >&2
+"""
+
+STUB_VERSIONS = {
+    "lilypond": "GNU LilyPond 2.24.2 (running Guile 2.2)",
+    "lualatex": "This is LuaHBTeX, Version 1.17.0 (TeX Live 2023)",
+    "latexmk": "Latexmk, John Collins, 7 Jan. 2023. Version 4.79"
+}
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "EES Benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@example.org",
+    "GIT_AUTHOR_DATE": "2023-10-01T12:00:00",
+    "GIT_COMMITTER_NAME": "EES Benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@example.org",
+    "GIT_COMMITTER_DATE": "2023-10-01T12:00:00",
+    "GIT_CONFIG_GLOBAL": os.devnull,
+    "GIT_CONFIG_NOSYSTEM": "1"
+}
+
+
+
+# Corpus generation -------------------------------------------------------
+
+def write_file(path, contents):
+    """Write a text file, creating missing folders."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        f.write(contents)
+
+
+def init_git_repo(path, origin, tag):
+    """Commit all files in a new git repository and tag the commit."""
+    env = {**os.environ, **GIT_ENV}
+    for command in (["init", "-q"],
+                    ["remote", "add", "origin", origin],
+                    ["add", "-A"],
+                    ["commit", "-q", "--allow-empty", "-m", "Initial commit"],
+                    ["tag", tag]):
+        subprocess.run(["git", *command], cwd=path, env=env, check=True)
+
+
+def make_log(rng, size, header, filler, messages, error, footer, path,
+             error_rate):
+    """Create a log of approximately `size` bytes with interspersed
+       messages, each of which is an error with probability `error_rate`."""
+    res = [header.format(path=path)]
+    n_bytes = len(res[0])
+    line = 1
+    while n_bytes < size:
+        if rng.random() < 0.05:
+            if rng.random() < error_rate:
+                chunk = error
+            else:
+                chunk = rng.choice(messages)
+        else:
+            chunk = rng.choice(filler)
+        chunk = chunk.format(path=path, line=line)
+        res.append(chunk)
+        n_bytes += len(chunk)
+        line += 1
+    res.append(footer)
+    return "".join(res)
+
+
+def make_work(root, composer, number, args, rng):
+    """Create a work repository with metadata, notes, scores, and logs."""
+    work_dir = os.path.join(root, "catalog", composer, f"work_{number:04d}")
+    movements = MOVEMENTS[:args.movements]
+
+    write_file(
+        os.path.join(work_dir, "metadata.yaml"),
+        METADATA_TEMPLATE.format(composer=composer,
+                                 composer_short=composer[:3],
+                                 number=number,
+                                 scoring=SCORING)
+    )
+    write_file(os.path.join(work_dir, "LICENSE"), LICENSE_HEADING + "\n")
+    write_file(os.path.join(work_dir, "front_matter", "critical_report.tex"),
+               CRITICAL_REPORT)
+
+    # notes and definitions
+    notes_files = sorted({f for f, _ in PARTS.values()})
+    for notes_file in notes_files:
+        variables = [v for f, v in PARTS.values() if f == notes_file]
+        write_file(
+            os.path.join(work_dir, "notes", f"{notes_file}.ly"),
+            "\\version \"2.24.2\"\n" + "".join(
+                NOTES_TEMPLATE.format(
+                    movement=m,
+                    variable=v,
+                    music=" ".join(rng.choice("cdefgab") + "4"
+                                   for _ in range(16 * args.bars))
+                )
+                for m in movements
+                for v in variables
+            )
+        )
+    write_file(
+        os.path.join(work_dir, "definitions.ly"),
+        DEFINITIONS_TEMPLATE.format(
+            includes="\n".join(f"\\include \"notes/{f}.ly\""
+                               for f in notes_files)
+        )
+    )
+
+    # scores
+    write_file(
+        os.path.join(work_dir, "scores", "full_score.ly"),
+        FULL_SCORE_TEMPLATE.format(bookparts="".join(
+            BOOKPART_TEMPLATE.format(
+                number=i + 1,
+                movement=m,
+                staves="\n".join(
+                    STAFF_TEMPLATE.format(part=p, movement=m, variable=v)
+                    for p, (_, v) in PARTS.items()
+                )
+            )
+            for i, m in enumerate(movements)
+        ))
+    )
+    for part, (_, variable) in PARTS.items():
+        write_file(os.path.join(work_dir, "scores", f"{part}.ly"),
+                   PART_TEMPLATE.format(movement=movements[0],
+                                        variable=variable))
+
+    # logs
+    write_file(
+        os.path.join(work_dir, "tmp", "full_score.ly.log"),
+        make_log(rng, args.log_kib * 1024, LY_LOG_HEADER, LY_LOG_FILLER,
+                 LY_LOG_MESSAGES, LY_LOG_ERROR, LY_LOG_FOOTER,
+                 work_dir, args.error_rate)
+    )
+    write_file(
+        os.path.join(work_dir, "tmp", "full_score.tex.log"),
+        make_log(rng, args.log_kib * 1024, TEX_LOG_HEADER, TEX_LOG_FILLER,
+                 TEX_LOG_MESSAGES, TEX_LOG_ERROR, TEX_LOG_FOOTER,
+                 work_dir, args.error_rate)
+    )
+
+    init_git_repo(work_dir,
+                  f"https://github.com/edition-esser-skala/"
+                  f"{composer.lower()}-{number:04d}.git",
+                  "v1.0.0")
+    return work_dir
+
+
+def make_tools(root):
+    """Create a tagged EES Tools repository that links to this
+       installation, and stubs of the external programs."""
+    tools_dir = os.path.join(root, "tools")
+    os.makedirs(tools_dir)
+    for name in os.listdir(TOOLS_DIR):
+        if not name.startswith("."):
+            os.symlink(os.path.join(TOOLS_DIR, name),
+                       os.path.join(tools_dir, name))
+    init_git_repo(tools_dir,
+                  "https://github.com/edition-esser-skala/ees-tools.git",
+                  "v2023.10.0")
+
+    bin_dir = os.path.join(root, "bin")
+    for program, version in STUB_VERSIONS.items():
+        stub = os.path.join(bin_dir, program)
+        write_file(stub, STUB_TEMPLATE.format(version=version))
+        os.chmod(stub, 0o755)
+
+
+def make_collection_repo(root, work_dirs):
+    """Create a collection repository that links to all works."""
+    coll_dir = os.path.join(root, "collection")
+    for work_dir in work_dirs:
+        link = os.path.join(coll_dir, "works", work_id(work_dir))
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        os.symlink(work_dir, link)
+    write_file(os.path.join(coll_dir, "LICENSE"), LICENSE_HEADING + "\n")
+    os.makedirs(os.path.join(coll_dir, "tmp"))
+    init_git_repo(coll_dir,
+                  "https://github.com/edition-esser-skala/collection.git",
+                  "v1.0.0")
+
+
+def work_id(work_dir):
+    """Name of a work in the collection and in the log folder."""
+    return "_".join(work_dir.split(os.sep)[-2:])
+
+
+def generate_corpus(root, n_works, args):
+    """Create a corpus of `n_works` works in `root`."""
+    rng = random.Random(args.seed)
+    os.makedirs(root)
+    make_tools(root)
+
+    work_dirs = []
+    for i in range(n_works):
+        composer = COMPOSERS[i % len(COMPOSERS)]
+        if i >= len(COMPOSERS) * 10:
+            composer += str(i // (len(COMPOSERS) * 10))
+        work_dirs.append(make_work(root, composer, i + 1, args, rng))
+
+    # all logs in one folder for parse_logs.py
+    log_dir = os.path.join(root, "logs")
+    os.makedirs(log_dir)
+    for work_dir in work_dirs:
+        for log in ("full_score.ly.log", "full_score.tex.log"):
+            os.link(os.path.join(work_dir, "tmp", log),
+                    os.path.join(log_dir, f"{work_id(work_dir)}_{log}"))
+
+    make_collection_repo(root, work_dirs)
+
+    corpus = {"works": n_works, "settings": corpus_settings(args),
+              "work_dirs": work_dirs}
+    write_file(os.path.join(root, "corpus.json"), json.dumps(corpus))
+    return corpus
+
+
+def corpus_settings(args):
+    """Settings that determine the generated corpus."""
+    return {"seed": args.seed, "movements": args.movements,
+            "bars": args.bars, "log_kib": args.log_kib,
+            "error_rate": args.error_rate}
+
+
+def get_corpus(root, n_works, args):
+    """Reuse the corpus in `root` if it matches the settings,
+       otherwise generate it anew."""
+    try:
+        with open(os.path.join(root, "corpus.json"), encoding="utf8") as f:
+            corpus = json.load(f)
+        if (corpus["works"] == n_works
+                and corpus["settings"] == corpus_settings(args)):
+            return corpus
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"Generating a corpus of {n_works} works in {root}")
+    return generate_corpus(root, n_works, args)
+
+
+
+# Benchmarks --------------------------------------------------------------
+
+def benchmark_commands(root, corpus, args):
+    """Yield (name, working directory, commands) of each benchmark.
+       Each command is run in the given directory."""
+    python = sys.executable
+    read_metadata = os.path.join(TOOLS_DIR, "read_metadata.py")
+
+    yield ("table", os.path.join(root, "catalog"),
+           [[python, read_metadata, "table", "--no-cache",
+             "-j", str(args.jobs), "-o", os.devnull]])
+
+    yield ("table_cached", os.path.join(root, "catalog"),
+           [[python, read_metadata, "table",
+             "-j", str(args.jobs), "-o", os.devnull]])
+
+    sample = corpus["work_dirs"][:args.edition_sample]
+    yield ("edition", None,
+           [(d, [python, read_metadata, "edition", "-c", "tag",
+                 "--types", "all"])
+            for d in sample])
+
+    # add_variables.py appends to the notes, so it runs on copies
+    add_variables = os.path.join(TOOLS_DIR, "utils", "add_variables.py")
+    scratch_dir = os.path.join(root, "add_variables")
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    for d in sample:
+        shutil.copytree(os.path.join(d, "notes"),
+                        os.path.join(scratch_dir, work_id(d), "notes"))
+    yield ("add_variables", None,
+           [(os.path.join(scratch_dir, work_id(d)),
+             [python, add_variables, "-m", "Benchmark", "-k", "d",
+              "-t", "3/4"])
+            for d in sample])
+
+    make_collection = os.path.join(TOOLS_DIR, "utils", "make_collection.py")
+    works = [work_id(d) for d in corpus["work_dirs"]]
+    yield ("collection", os.path.join(root, "collection"),
+           [[python, make_collection, "--no-cache", "bench", *works]])
+
+    yield ("collection_cached", os.path.join(root, "collection"),
+           [[python, make_collection, "bench", *works]])
+
+    yield ("logs", root,
+           [[python, os.path.join(TOOLS_DIR, "parse_logs.py"),
+             "--no-cache", os.path.join(root, "logs")]])
+
+    yield ("logs_cached", root,
+           [[python, os.path.join(TOOLS_DIR, "parse_logs.py"),
+             os.path.join(root, "logs")]])
+
+
+def run_benchmark(directory, commands, env):
+    """Run the commands of a benchmark and return the elapsed time
+       and the exit status of the first failing command."""
+    status = 0
+    start = time.perf_counter()
+    for command in commands:
+        if directory is None:
+            cwd, command = command
+        else:
+            cwd = directory
+        res = subprocess.run(command, cwd=cwd, env=env, check=False,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, text=True)
+        if res.returncode != 0 and status == 0:
+            status = res.returncode
+            print(f"  '{' '.join(command[1:3])}' failed in {cwd}:\n"
+                  f"  {res.stderr.strip()}")
+    return time.perf_counter() - start, status
+
+
+def without_context(message):
+    """Remove the context from a message found in a LaTeX log."""
+    return {k: v for k, v in message.items() if k not in ("context", "text")}
+
+
+def compare_tex_scanner(files):
+    """Compare the LaTeX log scanner of parse_logs.py with texoutparse
+       in terms of messages found and run time."""
+    # pylint: disable=import-outside-toplevel
+    try:
+        from texoutparse import LatexLogParser
+    except ImportError:
+        print("texoutparse is not installed, skipping tex_scanner")
+        return None
+    sys.path.insert(0, TOOLS_DIR)
+    import parse_logs
+
+    res = {"files": len(files), "messages": 0, "mismatches": [],
+           "context_differences": 0,
+           "texoutparse_seconds": 0.0, "native_seconds": 0.0}
+    for file in files:
+        start = time.perf_counter()
+        parser = LatexLogParser()
+        with open(file, encoding="utf8") as f:
+            parser.process(f)
+        reference = [{"severity": severity, **m.info,
+                      "context": [line.strip("\n")
+                                  for line in m.context_lines]}
+                     for severity, messages in (("error", parser.errors),
+                                                ("warning", parser.warnings),
+                                                ("badbox", parser.badboxes))
+                     for m in messages]
+        res["texoutparse_seconds"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        native = parse_logs.check_tex_log(file)
+        res["native_seconds"] += time.perf_counter() - start
+
+        # texoutparse shows wrong context lines if messages follow each
+        # other closely, so these differences are only counted
+        reference = json.loads(json.dumps(reference))
+        if ([without_context(m) for m in reference]
+                != [without_context(m) for m in native]):
+            res["mismatches"].append(file)
+        else:
+            res["context_differences"] += sum(
+                a["context"] != b["context"]
+                for a, b in zip(reference, native)
+            )
+        res["messages"] += len(native)
+
+    res["speedup"] = round(res["texoutparse_seconds"]
+                           / max(res["native_seconds"], 1e-9), 2)
+    print(f"{'tex_scanner':>17} {len(files):>6} files: "
+          f"{res['speedup']:.1f} times faster than texoutparse, "
+          f"{len(res['mismatches'])} mismatches")
+    return res
+
+
+def get_tools_commit():
+    """Get the commit of this EES Tools installation."""
+    res = subprocess.run(["git", "rev-parse", "HEAD"], cwd=TOOLS_DIR,
+                         capture_output=True, text=True, check=False)
+    return res.stdout.strip() or None
+
+
+def run_benchmarks(args):
+    """Run all selected benchmarks for each corpus size."""
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ees-benchmark-")
+    results = []
+    tex_logs = []
+
+    for n_works in args.sizes:
+        root = os.path.realpath(os.path.join(work_dir, f"works_{n_works}"))
+        corpus = get_corpus(root, n_works, args)
+        env = {
+            **os.environ,
+            "PATH": os.path.join(root, "bin") + os.pathsep
+                    + os.environ["PATH"],
+            "EES_TOOLS_PATH": os.path.join(root, "tools"),
+            "EES_CACHE_DIR": os.path.join(root, "cache"),
+            "PYTHONDONTWRITEBYTECODE": "1"
+        }
+        env.pop("EES_METADATA_SOCKET", None)
+        tex_logs = glob.glob(os.path.join(root, "logs", "*.tex.log"))
+
+        for name, directory, commands in benchmark_commands(root, corpus,
+                                                            args):
+            if args.benchmarks and name not in args.benchmarks:
+                continue
+            times = []
+            status = 0
+            for _ in range(args.repeat):
+                elapsed, status = run_benchmark(directory, commands, env)
+                times.append(round(elapsed, 4))
+            result = {
+                "benchmark": name,
+                "works": n_works,
+                "commands": len(commands),
+                "status": status,
+                "times": times,
+                "min": min(times),
+                "median": round(statistics.median(times), 4)
+            }
+            results.append(result)
+            print(f"{name:>17} {n_works:>6} works: "
+                  f"median {result['median']:8.3f} s, "
+                  f"min {result['min']:8.3f} s"
+                  + ("" if status == 0 else f" (exit status {status})"))
+
+    # compare LaTeX log scanners on the largest corpus and on real logs
+    tex_scanner = None
+    if not args.benchmarks or "tex_scanner" in args.benchmarks:
+        for pattern in args.tex_logs:
+            tex_logs += sorted(glob.glob(pattern))
+        tex_scanner = compare_tex_scanner(tex_logs)
+
+    if args.work_dir is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "tools_commit": get_tools_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {**corpus_settings(args), "repeat": args.repeat,
+                     "jobs": args.jobs, "edition_sample": args.edition_sample},
+        "results": results,
+        "tex_scanner": tex_scanner
+    }
+    with open(args.output, "w", encoding="utf8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare_results(args.compare, report)
+
+
+def compare_results(file, report):
+    """Print the ratio of median times compared to previous results."""
+    with open(file, encoding="utf8") as f:
+        previous = {(r["benchmark"], r["works"]): r["median"]
+                    for r in json.load(f)["results"]}
+
+    print(f"\nComparison with {file} (ratio < 1: faster):")
+    for r in report["results"]:
+        old = previous.get((r["benchmark"], r["works"]))
+        if old is None:
+            continue
+        print(f"{r['benchmark']:>17} {r['works']:>6} works: "
+              f"{old:8.3f} s -> {r['median']:8.3f} s "
+              f"(ratio {r['median'] / old if old else float('nan'):.2f})")
+
+
+
+# Create parser -----------------------------------------------------------
+
+parser = argparse.ArgumentParser(
+    description="""Time read_metadata.py, make_collection.py,
+                   add_variables.py, and parse_logs.py on synthetic
+                   corpora of works."""
+)
+parser.add_argument(
+    "-s",
+    "--sizes",
+    help="number of works in each corpus (default: 10 100 1000)",
+    nargs="+",
+    type=int,
+    default=[10, 100, 1000]
+)
+parser.add_argument(
+    "-b",
+    "--benchmarks",
+    help="""run only these benchmarks
+            (table, table_cached, edition, add_variables, collection,
+            collection_cached, logs, logs_cached, tex_scanner;
+            default: all)""",
+    nargs="+",
+    default=None
+)
+parser.add_argument(
+    "-r",
+    "--repeat",
+    help="run each benchmark this many times (default: 3)",
+    type=int,
+    default=3
+)
+parser.add_argument(
+    "-o",
+    "--output",
+    help="write results to this JSON file (default: benchmark.json)",
+    default="benchmark.json"
+)
+parser.add_argument(
+    "-c",
+    "--compare",
+    help="compare results to a previous JSON file",
+    default=None
+)
+parser.add_argument(
+    "-w",
+    "--work-dir",
+    help="""create corpora in this folder and keep them for subsequent
+            runs (default: temporary folder)""",
+    default=None
+)
+parser.add_argument(
+    "-t",
+    "--tex-logs",
+    help="""also compare the LaTeX log scanner with texoutparse on
+            these files (glob patterns)""",
+    nargs="+",
+    default=[]
+)
+parser.add_argument(
+    "-j",
+    "--jobs",
+    help="number of parallel jobs for read_metadata.py table (default: 1)",
+    type=int,
+    default=1
+)
+parser.add_argument(
+    "--edition-sample",
+    help="""run read_metadata.py edition and add_variables.py for this
+            many works (default: 10)""",
+    type=int,
+    default=10
+)
+parser.add_argument(
+    "--movements",
+    help="number of movements per work (default: 3)",
+    type=int,
+    default=3
+)
+parser.add_argument(
+    "--bars",
+    help="number of bars per movement and instrument (default: 20)",
+    type=int,
+    default=20
+)
+parser.add_argument(
+    "--log-kib",
+    help="size of each log file in KiB (default: 256)",
+    type=int,
+    default=256
+)
+parser.add_argument(
+    "--error-rate",
+    help="""probability that a message in a log is an error
+            instead of a warning (default: 0)""",
+    type=float,
+    default=0.0
+)
+parser.add_argument(
+    "--seed",
+    help="seed of the random number generator (default: 1)",
+    type=int,
+    default=1
+)
+
+
+if __name__ == "__main__":
+    run_benchmarks(parser.parse_args())
@@ -0,0 +1,431 @@
+"""Build the targets of ees.mk, starting the jobs that are expected to take
+longest first.
+
+Usage: build.py [-j N] [-m MIB] target ...
+
+The wall time and peak memory usage of each job are recorded in a ledger
+(tmp/.build_ledger.json), which predicts the duration and memory usage of
+the job in later builds. Jobs only start if the expected memory usage of
+all running jobs does not exceed the available memory.
+"""
+
+import argparse
+import glob
+import json
+import os
+from os import cpu_count, getenv, makedirs, path
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Iterable
+
+# read_metadata.py resides in the parent folder
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+import read_metadata  # pylint: disable=wrong-import-position
+import ly_deps  # pylint: disable=wrong-import-position
+
+
+TOOLS_DIR = path.dirname(path.dirname(path.realpath(__file__)))
+TOOLS_PATH = getenv("EES_TOOLS_PATH", TOOLS_DIR)
+
+# same commands as in ees.mk
+LILYPOND = (([sys.executable,
+              path.join(TOOLS_DIR, "utils", "engrave_cache.py")]
+             if getenv("EES_ENGRAVE_CACHE") else [])
+            + ["lilypond", "-ddelete-intermediate-files",
+               "-dno-point-and-click", f"--include={TOOLS_PATH}/"])
+LATEXMK = ["latexmk", "-cd", "-lualatex", "-outdir=../final"]
+CRITICAL_REPORT = "front_matter/critical_report.tex"
+
+LEDGER_FILE = "tmp/.build_ledger.json"
+LEDGER_VERSION = 1
+# number of recent runs of each job kept in the ledger
+LEDGER_RUNS = 5
+
+# expected duration (s) of jobs without any recorded runs of their kind
+DEFAULT_DURATION = 1.0
+
+# an action is a command or a function that returns the text to print
+Action = list[str] | Callable[[], str]
+
+
+class Job:
+    """Node of the build graph: actions that create the outputs from the
+       inputs after the jobs it depends on have finished. Jobs without
+       outputs always run, like phony targets."""
+
+    def __init__(self, name: str, kind: str, actions: list[Action],
+                 deps: Iterable[str] = (), inputs: Iterable[str] = (),
+                 outputs: Iterable[str] = ()):
+        self.name = name
+        self.kind = kind
+        self.actions = actions
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def up_to_date(self) -> bool:
+        """Check whether all outputs are newer than all inputs."""
+        if not self.outputs:
+            return False
+        try:
+            oldest = min(path.getmtime(f) for f in self.outputs)
+            return all(path.getmtime(f) <= oldest for f in self.inputs)
+        except FileNotFoundError:
+            return False
+
+
+def find_files(folder: str) -> list[str]:
+    """Get the names of the LilyPond files in a folder and its subfolders,
+       without folder and suffix (e.g., 'full_score')."""
+    return sorted(path.relpath(f, folder)[:-3]
+                  for f in glob.glob(f"{folder}/**/*.ly", recursive=True))
+
+
+def print_file(file: str) -> Callable[[], str]:
+    """Get an action that prints a file."""
+    def action() -> str:
+        with open(file, encoding="utf8", errors="replace") as f:
+            return f.read()
+    return action
+
+
+def copy_file(source: str, destination: str) -> Callable[[], str]:
+    """Get an action that copies a file."""
+    def action() -> str:
+        shutil.copyfile(source, destination)
+        return ""
+    return action
+
+
+def tee(command: list[str], file: str) -> Callable[[], str]:
+    """Get an action that runs a command and saves its output in a file."""
+    def action() -> str:
+        output = subprocess.run(command, capture_output=True, text=True,
+                                check=True).stdout
+        with open(file, "w", encoding="utf8") as f:
+            f.write(output)
+        return output
+    return action
+
+
+def add_target(target: str, scores: list[str], jobs: dict[str, Job]) -> None:
+    """Add the job of a target of ees.mk and the jobs it depends on
+       to the build graph."""
+    if target in jobs:
+        return
+    if target in scores:
+        score_file = f"scores/{target}.ly"
+        jobs[target] = Job(
+            target, "lilypond",
+            [LILYPOND + [f"-dlog-file=tmp/{target}.ly", "-o", "tmp",
+                         path.realpath(score_file)],
+             print_file(f"tmp/{target}.ly.log")],
+            inputs=["definitions.ly",
+                    *ly_deps.score_dependencies(score_file, [TOOLS_PATH])],
+            outputs=[f"tmp/{target}.pdf"]
+        )
+    elif target == "scores":
+        for score in scores:
+            add_target(score, scores, jobs)
+        jobs[target] = Job(target, "group", [], deps=scores)
+    elif target == "macros":
+        socket = getenv("EES_METADATA_SOCKET")
+        jobs[target] = Job(
+            target, "macros",
+            [["python", path.join(TOOLS_PATH, "read_metadata.py"), "edition",
+              "-c", "tag", "--types", *scores,
+              *(["--via-socket", socket] if socket else [])]]
+        )
+    elif target == "final/midi":
+        jobs[target] = Job(
+            target, "midi",
+            [["zip", "-j", "final/midi_collection.zip",
+              *sorted(glob.glob("midi/*"))]] if path.isdir("midi") else []
+        )
+    elif target.startswith("final/") and target[6:] in scores:
+        score = target[6:]
+        add_target(score, scores, jobs)
+        add_target("macros", scores, jobs)
+        jobs[target] = Job(
+            target, "latex",
+            [LATEXMK + [f"-jobname={score}", CRITICAL_REPORT],
+             copy_file(f"final/{score}.log", f"tmp/{score}.tex.log"),
+             ["latexmk", "-c", "-outdir=final", f"-jobname={score}",
+              CRITICAL_REPORT]],
+            # the macros only need to exist (order-only prerequisite)
+            deps=[score, "macros"],
+            inputs=[CRITICAL_REPORT, f"tmp/{score}.pdf", "metadata.yaml",
+                    "CHANGELOG.md"],
+            outputs=[f"final/{score}.pdf"]
+        )
+    elif target == "final/scores":
+        finals = ["final/midi"] + [f"final/{s}" for s in scores]
+        for final in finals:
+            add_target(final, scores, jobs)
+        jobs[target] = Job(
+            target, "logs",
+            [tee(["python", path.join(TOOLS_PATH, "parse_logs.py")],
+                 "tmp/_logs.txt")],
+            deps=finals
+        )
+    else:
+        raise ValueError(f"No rule to make target '{target}'")
+
+
+def load_ledger() -> dict[str, list[dict]]:
+    """Load the recorded runs of each job."""
+    try:
+        with open(LEDGER_FILE, encoding="utf8") as f:
+            ledger = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if ledger.get("version") != LEDGER_VERSION:
+        return {}
+    return ledger["jobs"]
+
+
+def save_ledger(ledger: dict[str, list[dict]]) -> None:
+    """Save the recorded runs of each job."""
+    read_metadata.write_json_atomic(
+        LEDGER_FILE, {"version": LEDGER_VERSION, "jobs": ledger}
+    )
+
+
+def expected_usage(jobs: dict[str, Job],
+                   ledger: dict[str, list[dict]]
+                   ) -> dict[str, tuple[float, int]]:
+    """Predict the duration (s) and peak memory usage (KiB) of each job
+       from its recorded runs or, if there are none, from the mean of the
+       recorded runs of jobs of the same kind."""
+    runs_of_kind: dict[str, list[dict]] = {}
+    for job in jobs.values():
+        runs_of_kind.setdefault(job.kind, []).extend(ledger.get(job.name, []))
+
+    res = {}
+    for job in jobs.values():
+        runs = ledger.get(job.name) or runs_of_kind[job.kind]
+        if not job.actions:
+            res[job.name] = (0.0, 0)
+        elif runs:
+            res[job.name] = (sum(r["duration"] for r in runs) / len(runs),
+                             max(r["peak_rss"] for r in runs))
+        else:
+            res[job.name] = (DEFAULT_DURATION, 0)
+    return res
+
+
+def priorities(jobs: dict[str, Job],
+               durations: dict[str, float]) -> dict[str, float]:
+    """Get the expected time from the start of each job until all jobs that
+       depend on it have finished, i.e., the length of the longest path
+       through the build graph that starts with the job."""
+    dependents: dict[str, list[str]] = {name: [] for name in jobs}
+    for job in jobs.values():
+        for dep in job.deps:
+            dependents[dep].append(job.name)
+
+    res: dict[str, float] = {}
+
+    def visit(name: str) -> float:
+        if name not in res:
+            res[name] = durations[name] + max(
+                (visit(d) for d in dependents[name]), default=0.0
+            )
+        return res[name]
+
+    for name in jobs:
+        visit(name)
+    return res
+
+
+def available_memory() -> int | None:
+    """Get the available memory in KiB, or None if it is unknown."""
+    try:
+        with open("/proc/meminfo", encoding="utf8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        return (os.sysconf("SC_AVPHYS_PAGES")
+                * os.sysconf("SC_PAGE_SIZE")) >> 10
+    except (ValueError, OSError):
+        return None
+
+
+def run_command(command: list[str]) -> tuple[int, str, int]:
+    """Run a command and return its exit status, its output, and the peak
+       memory usage (KiB) of the command and its subprocesses."""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    output = process.stdout.read()
+    process.stdout.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return (process.returncode, output.decode("utf8", errors="replace"),
+            usage.ru_maxrss)
+
+
+def run_job(job: Job, results: queue.Queue) -> None:
+    """Run the actions of a job until one fails and put the job name, the
+       success, the output, the wall time, and the peak memory usage into
+       the result queue."""
+    start = time.perf_counter()
+    output = []
+    peak_rss = 0
+    success = True
+    for action in job.actions:
+        if callable(action):
+            try:
+                output.append(action())
+            except (OSError, subprocess.CalledProcessError) as e:
+                output.append(f"ERROR: {e}\n")
+                success = False
+        else:
+            try:
+                status, text, rss = run_command(action)
+            except OSError as e:
+                status, text, rss = 127, f"ERROR: {e}\n", 0
+            output.append(text)
+            peak_rss = max(peak_rss, rss)
+            success = status == 0
+        if not success:
+            break
+    results.put((job.name, success, "".join(output),
+                 time.perf_counter() - start, peak_rss))
+
+
+def build(jobs: dict[str, Job], ledger: dict[str, list[dict]],
+          max_jobs: int, memory: int | None) -> bool:
+    """Run the jobs that are not up to date in the order of their
+       dependencies, preferring jobs with the longest expected remaining
+       build time, and record their runs in the ledger. Stops starting jobs
+       after the first failure. Returns whether all jobs succeeded."""
+    usage = expected_usage(jobs, ledger)
+    priority = priorities(jobs, {n: d for n, (d, _) in usage.items()})
+
+    waiting = {name: set(job.deps) for name, job in jobs.items()}
+    ready: list[str] = []
+    running: dict[str, int] = {}    # name -> expected memory usage
+    results: queue.Queue = queue.Queue()
+    failed = []
+    started = 0
+
+    def finish(name: str) -> None:
+        """Release the jobs that only waited for a finished job."""
+        for other, deps in waiting.items():
+            if name in deps:
+                deps.remove(name)
+                if not deps:
+                    release(other)
+
+    def release(name: str) -> None:
+        """Queue a job whose dependencies have finished."""
+        if jobs[name].up_to_date():
+            finish(name)
+        else:
+            ready.append(name)
+
+    for name in [n for n, deps in waiting.items() if not deps]:
+        release(name)
+
+    while running or (ready and not failed):
+        ready.sort(key=lambda n: priority[n], reverse=True)
+        # do not skip a job that does not fit into memory, so that
+        # long jobs are not delayed indefinitely by shorter ones
+        while ready and not failed and len(running) < max_jobs:
+            name = ready[0]
+            rss = usage[name][1]
+            if (running and memory is not None
+                    and sum(running.values()) + rss > memory):
+                break
+            ready.pop(0)
+            if not jobs[name].actions:
+                finish(name)
+                continue
+            running[name] = rss
+            started += 1
+            print(f"Build {name} (expected: {usage[name][0]:.1f} s, "
+                  f"{rss >> 10} MiB)", flush=True)
+            threading.Thread(target=run_job, args=(jobs[name], results),
+                             daemon=True).start()
+        if not running:
+            continue
+
+        name, success, output, duration, rss = results.get()
+        del running[name]
+        print(output, end="" if output.endswith("\n") or not output else "\n")
+        if success:
+            print(f"Finished {name} in {duration:.1f} s ({rss >> 10} MiB)",
+                  flush=True)
+            ledger[name] = (ledger.get(name, [])
+                            + [{"duration": duration,
+                                "peak_rss": rss}])[-LEDGER_RUNS:]
+            finish(name)
+        else:
+            print(f"ERROR: {name} failed", flush=True)
+            failed.append(name)
+
+    if not started:
+        print("All targets are up to date.")
+    return not failed
+
+
+def main() -> None:
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="""Build targets of ees.mk (e.g., final/scores), starting
+                       the jobs that are expected to take longest first
+                       according to the durations of previous builds."""
+    )
+    parser.add_argument(
+        "targets",
+        nargs="+",
+        help="""targets of ees.mk: <score>, scores, final/<score>, macros,
+                final/midi, or final/scores"""
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=cpu_count(),
+        help="run up to N jobs in parallel (default: number of CPUs)",
+        metavar="N"
+    )
+    parser.add_argument(
+        "-m",
+        "--memory",
+        type=int,
+        help="""only start a job if the expected memory usage of all running
+                jobs does not exceed MIB MiB (default: available memory)""",
+        metavar="MIB"
+    )
+    args = parser.parse_args()
+
+    scores = find_files("scores")
+    jobs: dict[str, Job] = {}
+    try:
+        for target in args.targets:
+            add_target(target, scores, jobs)
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    makedirs("tmp", exist_ok=True)
+    if any(name.startswith("final/") for name in jobs):
+        makedirs("final", exist_ok=True)
+    memory = args.memory << 10 if args.memory else available_memory()
+    ledger = load_ledger()
+    success = build(jobs, ledger, max(args.jobs, 1), memory)
+    save_ledger(ledger)
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Run LilyPond unless its outputs are found in the engraving cache.
+
+Usage: engrave_cache.py lilypond [options] file.ly
+
+The cache is enabled by setting EES_ENGRAVE_CACHE to a folder. Each entry
+is keyed by the hashes of the input file and all files it includes, the
+LilyPond files of EES Tools, the LilyPond version, and the command line
+options, and contains the PDF, MIDI, TOC, and log files. The least recently
+used entries are removed if the cache exceeds EES_ENGRAVE_CACHE_SIZE MiB.
+"""
+
+import hashlib
+import json
+import os
+from os import path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# read_metadata.py resides in the parent folder
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+import read_metadata  # pylint: disable=wrong-import-position
+import ly_deps  # pylint: disable=wrong-import-position
+
+
+CACHE_DIR = os.getenv("EES_ENGRAVE_CACHE")
+CACHE_SIZE = int(os.getenv("EES_ENGRAVE_CACHE_SIZE", "2048")) << 20
+CACHE_VERSION = 1
+
+TOOLS_DIR = path.dirname(path.dirname(path.realpath(__file__)))
+
+# LilyPond files of EES Tools, which are hashed even if a score
+# does not include them directly
+TOOLS_FILES = ["ees.ly", "ees_articulate.ly", "score_settings"]
+
+# suffixes of LilyPond output files stored in the cache
+OUTPUT_SUFFIXES = (".pdf", ".midi", ".mid", ".toc", ".png", ".svg")
+
+MANIFEST_FILE = "manifest.json"
+
+
+def parse_command(command: list[str]) -> dict:
+    """Get the input file, the output base name, the log file, and the
+       include folders of a LilyPond command, as well as the options that
+       do not refer to paths."""
+    res = {"input": command[-1], "output": None, "log": None,
+           "include_dirs": [], "options": []}
+    args = iter(command[1:-1])
+    for arg in args:
+        if arg in ("-o", "--output", "-I", "--include"):
+            value = next(args, "")
+        elif arg.startswith(("-o", "-I")):
+            arg, value = arg[:2], arg[2:]
+        elif arg.startswith(("--output=", "--include=")):
+            arg, value = arg.split("=", 1)
+        elif arg.startswith("-dlog-file="):
+            res["log"] = arg.removeprefix("-dlog-file=") + ".log"
+            continue
+        else:
+            res["options"].append(arg)
+            continue
+        if arg in ("-o", "--output"):
+            res["output"] = value
+        else:
+            res["include_dirs"].append(value)
+
+    # LilyPond writes to FOLDER/<input name> or to FILE
+    stem = path.splitext(path.basename(res["input"]))[0]
+    if res["output"] is None:
+        res["output"] = stem
+    elif path.isdir(res["output"]) or res["output"].endswith("/"):
+        res["output"] = path.join(res["output"], stem)
+    else:
+        res["output"] = path.splitext(res["output"])[0]
+    return res
+
+
+def hash_files(files: list[str]) -> list[str]:
+    """Get the SHA256 hash of each file."""
+    return [read_metadata.file_hash(f) for f in files]
+
+
+def cache_key(command: list[str], parsed: dict) -> str:
+    """Get the key of a LilyPond command in the cache."""
+    closure = ly_deps.include_closure(parsed["input"],
+                                      parsed["include_dirs"])
+    tools_files = []
+    for name in TOOLS_FILES:
+        file = path.join(TOOLS_DIR, name)
+        if path.isdir(file):
+            tools_files += sorted(path.join(file, f)
+                                  for f in os.listdir(file)
+                                  if f.endswith(".ly"))
+        elif path.isfile(file):
+            tools_files.append(file)
+
+    version = read_metadata.get_tool_version("lilypond", command[0])
+
+    key = {
+        "version": CACHE_VERSION,
+        "lilypond": version,
+        "options": parsed["options"],
+        "output": path.basename(parsed["output"]),
+        "inputs": hash_files(list(closure)),
+        "tools": hash_files(tools_files)
+    }
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+def entry_dir(key: str) -> str:
+    """Get the folder of a cache entry."""
+    return path.join(CACHE_DIR, key[:2], key)
+
+
+def restore(key: str, parsed: dict) -> bool:
+    """Copy the outputs of a cache entry to their destinations.
+       Returns whether the entry exists."""
+    directory = entry_dir(key)
+    try:
+        with open(path.join(directory, MANIFEST_FILE), encoding="utf8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+
+    # copy without metadata, so that make regards the outputs as new;
+    # a concurrent build may have evicted the entry in the meantime
+    output_dir = path.dirname(parsed["output"]) or "."
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        for name in manifest["outputs"]:
+            shutil.copyfile(path.join(directory, name),
+                            path.join(output_dir, name))
+        if parsed["log"] and manifest["log"]:
+            shutil.copyfile(path.join(directory, manifest["log"]),
+                            parsed["log"])
+        os.utime(directory)
+    except OSError:
+        return False
+    return True
+
+
+def store(key: str, parsed: dict, start: float) -> None:
+    """Add the outputs of a LilyPond run to the cache."""
+    output_dir = path.dirname(parsed["output"]) or "."
+    prefix = path.basename(parsed["output"])
+    outputs = [
+        name for name in os.listdir(output_dir)
+        if (name.startswith((prefix + ".", prefix + "-"))
+            and name.endswith(OUTPUT_SUFFIXES)
+            and path.getmtime(path.join(output_dir, name)) >= start - 1)
+    ]
+
+    os.makedirs(path.dirname(entry_dir(key)), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=path.dirname(entry_dir(key)))
+    for name in outputs:
+        shutil.copyfile(path.join(output_dir, name), path.join(tmp_dir, name))
+    log = None
+    if parsed["log"] and path.isfile(parsed["log"]):
+        log = "lilypond.log"
+        shutil.copyfile(parsed["log"], path.join(tmp_dir, log))
+    with open(path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf8") as f:
+        json.dump({"outputs": outputs, "log": log}, f)
+
+    try:
+        os.rename(tmp_dir, entry_dir(key))
+    except OSError:
+        # another build stored the same entry in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def evict() -> None:
+    """Remove the least recently used entries until the cache
+       does not exceed CACHE_SIZE."""
+    entries = []
+    for prefix in os.scandir(CACHE_DIR):
+        if not prefix.is_dir():
+            continue
+        for entry in os.scandir(prefix.path):
+            if not path.isfile(path.join(entry.path, MANIFEST_FILE)):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            entries.append((entry.stat().st_mtime, size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, directory in sorted(entries):
+        if total <= CACHE_SIZE:
+            break
+        shutil.rmtree(directory, ignore_errors=True)
+        total -= size
+
+
+def command_not_found(program: str) -> None:
+    """Exit like a shell if a program is not installed."""
+    print(f"{program}: command not found", file=sys.stderr)
+    sys.exit(127)
+
+
+def main() -> None:
+    """Main function."""
+    command = sys.argv[1:]
+    if len(command) < 2:
+        print(__doc__.split("\n\n")[1])
+        sys.exit(2)
+    if shutil.which(command[0]) is None:
+        command_not_found(command[0])
+    if not CACHE_DIR:
+        os.execvp(command[0], command)
+
+    parsed = parse_command(command)
+    key = cache_key(command, parsed)
+    if restore(key, parsed):
+        print(f"Restored {parsed['output']} from the engraving cache",
+              file=sys.stderr)
+        return
+
+    start = time.time()
+    try:
+        status = subprocess.run(command, check=False).returncode
+    except FileNotFoundError:
+        command_not_found(command[0])
+    if status != 0:
+        sys.exit(status)
+    try:
+        store(key, parsed, start)
+        evict()
+    except OSError as e:
+        print(f"WARNING: Unable to update the engraving cache: {e}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
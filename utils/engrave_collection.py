@@ -0,0 +1,220 @@
+"""Engrave the full score of a collection with one LilyPond job per work."""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import json
+from os import cpu_count, getenv, makedirs, path, remove
+import re
+import shutil
+import subprocess
+import sys
+
+import ly_blocks
+
+
+LILYPOND = ["lilypond", "-ddelete-intermediate-files", "-dno-point-and-click"]
+
+# run LilyPond via the engraving cache if enabled
+ENGRAVE_CACHE = ([sys.executable,
+                  path.join(path.dirname(path.realpath(__file__)),
+                            "engrave_cache.py")]
+                 if getenv("EES_ENGRAVE_CACHE") else [])
+
+# comment that make_collection.py writes before the bookparts of each work
+re_work_marker = re.compile(
+    r"^[ \t]*% from works/(\S+)/scores/full_score\.ly\n",
+    re.MULTILINE
+)
+
+re_pages = re.compile(r"^Pages:\s+(\d+)", re.MULTILINE)
+
+PART_TEMPLATE = """\
+% created by engrave_collection.py from {source}
+{header}\\book {{
+  \\paper {{ first-page-number = {first_page} }}
+{prefix}{bookparts}}}{footer}"""
+
+# page counts of the previous build, which predict the first page numbers
+PAGES_FILE = "pages.json"
+
+# number of attempts to engrave parts with correct first page numbers
+MAX_ROUNDS = 3
+
+
+def split_full_score(source: str) -> tuple[str, str, list[tuple[str, str]],
+                                            str]:
+    """Split the full score of a collection into the text before
+       the \\book block, the contents of the \\book block before the
+       bookparts of the first work, the bookparts of each work,
+       and the text after the \\book block.
+       Returns a tuple (header, prefix, [(work, bookparts), ...], footer)."""
+    books = ly_blocks.top_level(ly_blocks.find_blocks(source, ("book",)),
+                                "book")
+    if len(books) != 1:
+        raise ValueError("The full score must contain exactly one \\book.")
+    book = books[0]
+    body = book.body(source)
+
+    markers = list(re_work_marker.finditer(body))
+    if not markers:
+        raise ValueError("The full score does not mark the bookparts "
+                         "of each work. Run make_collection.py again.")
+    ends = [m.start() for m in markers[1:]] + [len(body)]
+    parts = [(m.group(1), body[m.start():end])
+             for m, end in zip(markers, ends)]
+    prefix = body[:markers[0].start()].lstrip("\n")
+
+    return source[:book.start], prefix, parts, source[book.end:]
+
+
+def first_pages(page_counts: list[int]) -> list[int]:
+    """Get the first page number of each part from the page counts."""
+    res = []
+    page = 1
+    for count in page_counts:
+        res.append(page)
+        page += count
+    return res
+
+
+def page_count(pdf: str) -> int:
+    """Get the number of pages of a PDF file."""
+    output = subprocess.run(["pdfinfo", pdf],
+                            capture_output=True,
+                            text=True,
+                            check=True).stdout
+    return int(re_pages.search(output).group(1))
+
+
+def engrave(part_file: str, log_file: str, include_dirs: list[str]) -> int:
+    """Engrave a part with LilyPond and return the exit status.
+       The PDF and the TOC are saved next to the part, and the LilyPond
+       log is saved as '<log_file>.log'."""
+    base = path.abspath(path.splitext(part_file)[0])
+    with contextlib.suppress(FileNotFoundError):
+        remove(f"{base}.toc")
+    command = (ENGRAVE_CACHE
+               + LILYPOND
+               + [f"--include={d}" for d in include_dirs]
+               + [f"-dlog-file={path.abspath(log_file)}",
+                  "-o", base, f"{base}.ly"])
+    return subprocess.run(command, check=False).returncode
+
+
+def main() -> None:
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="""Engrave the full score of a collection created by
+                       make_collection.py with one LilyPond job per work
+                       and combine the PDFs and TOCs."""
+    )
+    parser.add_argument("name", help="name of the collection")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=cpu_count(),
+        help="run N LilyPond jobs in parallel (default: number of CPUs)",
+        metavar="N"
+    )
+    args = parser.parse_args()
+
+    score_file = f"collections/{args.name}/full_score.ly"
+    out_dir = f"tmp/{args.name}"
+    parts_dir = path.join(out_dir, "parts")
+    makedirs(parts_dir, exist_ok=True)
+
+    with open(score_file, encoding="utf8") as f:
+        source = f.read()
+    try:
+        header, prefix, parts, footer = split_full_score(source)
+    except ValueError as e:
+        print(f"ERROR: {score_file}: {e}")
+        sys.exit(1)
+
+    # the parts include the collection files relative to the collection
+    # folder and the works relative to the root folder
+    include_dirs = [getenv("EES_TOOLS_PATH", "."),
+                    path.abspath(path.dirname(score_file)),
+                    path.abspath(".")]
+    part_files = [path.join(parts_dir, f"part_{i:03d}.ly")
+                  for i in range(1, len(parts) + 1)]
+    # logs are saved in tmp/, where parse_logs.py finds them
+    log_files = [f"tmp/{args.name}_{work.replace('/', '_')}.ly"
+                 for work, _ in parts]
+
+    try:
+        with open(path.join(parts_dir, PAGES_FILE), encoding="utf8") as f:
+            previous_counts = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous_counts = {}
+    pages = first_pages([previous_counts.get(work, 1) for work, _ in parts])
+
+    # Page numbers must continue across works. Since the page counts are
+    # only known after engraving, parts whose first page number was
+    # predicted incorrectly are engraved again.
+    stale = list(range(len(parts)))
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for _ in range(MAX_ROUNDS):
+            for i in stale:
+                with open(part_files[i], "w", encoding="utf8") as f:
+                    f.write(PART_TEMPLATE.format(
+                        source=score_file,
+                        header=header,
+                        first_page=pages[i],
+                        prefix=prefix,
+                        bookparts=parts[i][1],
+                        footer=footer
+                    ))
+            print("Engrave", " ".join(parts[i][0] for i in stale))
+            status = list(executor.map(
+                lambda i: engrave(part_files[i], log_files[i], include_dirs),
+                stale
+            ))
+            failed = [parts[i][0] for i, s in zip(stale, status) if s != 0]
+            if failed:
+                print("ERROR: LilyPond failed for", " ".join(failed))
+                sys.exit(1)
+
+            page_counts = [page_count(path.splitext(f)[0] + ".pdf")
+                           for f in part_files]
+            correct_pages = first_pages(page_counts)
+            stale = [i for i, (p, c) in enumerate(zip(pages, correct_pages))
+                     if p != c]
+            pages = correct_pages
+            if not stale:
+                break
+        else:
+            print("ERROR: Page numbers did not converge after",
+                  MAX_ROUNDS, "rounds")
+            sys.exit(1)
+
+    with open(path.join(parts_dir, PAGES_FILE), "w", encoding="utf8") as f:
+        json.dump({work: count
+                   for (work, _), count in zip(parts, page_counts)}, f)
+
+    # combine PDFs and TOCs
+    pdfs = [path.splitext(f)[0] + ".pdf" for f in part_files]
+    full_score_pdf = path.join(out_dir, "full_score.pdf")
+    if len(pdfs) == 1:
+        shutil.copyfile(pdfs[0], full_score_pdf)
+    else:
+        subprocess.run(["pdfunite", *pdfs, full_score_pdf], check=True)
+
+    tocs = []
+    for f in part_files:
+        try:
+            with open(path.splitext(f)[0] + ".toc", encoding="utf8") as toc:
+                tocs.append(toc.read())
+        except FileNotFoundError:
+            pass
+    with open(path.join(out_dir, "full_score.toc"), "w", encoding="utf8") as f:
+        f.write("\n".join(t for t in tocs if t))
+
+    print(f"Engraved {len(parts)} works on {sum(page_counts)} pages: "
+          f"{full_score_pdf}")
+
+
+if __name__ == "__main__":
+    main()
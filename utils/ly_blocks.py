@@ -0,0 +1,249 @@
+"""Find blocks such as \\paper, \\bookpart, or \\score and top-level
+   statements in LilyPond files."""
+
+import argparse
+import re
+from typing import Iterator, NamedTuple
+
+
+# blocks returned by default
+BLOCK_COMMANDS = ("paper", "bookpart", "score", "context")
+
+# LilyPond identifiers (names of variables and commands) consist of letters,
+# which may be joined by single hyphens or underscores (e.g., violino_I);
+# IDENTIFIER_END prevents matching the beginning of a longer identifier
+IDENTIFIER = r"[A-Za-z]+(?:[-_][A-Za-z]+)*"
+IDENTIFIER_END = r"(?![A-Za-z]|[-_][A-Za-z])"
+
+# tokens relevant to the block structure; everything else is skipped
+re_token = re.compile(
+    r"""
+      (?P<comment>%\{.*?%\}|%[^\n]*)
+    | (?P<char>\#\\.)
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<open>\#?\{)
+    | (?P<close>\#?\})
+    | (?P<scheme>[\#$]['`]?\()
+    | (?P<command>\\""" + IDENTIFIER + r""")
+    """,
+    re.VERBOSE | re.DOTALL
+)
+
+# tokens in Scheme expressions, which may contain LilyPond code in #{ ... #}
+re_scheme_token = re.compile(
+    r"""
+      (?P<comment>;[^\n]*|\#\|.*?\|\#)
+    | (?P<char>\#\\.)
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<open>\#\{)
+    | (?P<paren>[()])
+    """,
+    re.VERBOSE | re.DOTALL
+)
+
+
+class Token(NamedTuple):
+    """Token of a LilyPond file."""
+    kind: str                   # 'comment', 'string', 'open', 'close',
+                                # or 'command'
+    start: int
+    end: int
+
+
+class Block(NamedTuple):
+    """Block '\\command { ... }' in a LilyPond file."""
+    command: str                # without backslash, e.g. 'paper'
+    start: int                  # offset of the backslash
+    body_start: int             # offset after the opening brace
+    body_end: int               # offset of the closing brace
+    end: int                    # offset after the closing brace
+    parents: tuple[str, ...]    # enclosing commands (outermost first),
+                                # '' for braces without command
+
+    def text(self, source: str) -> str:
+        """Return the block in the source."""
+        return source[self.start:self.end]
+
+    def body(self, source: str) -> str:
+        """Return the contents of the block between the braces."""
+        return source[self.body_start:self.body_end]
+
+    def contains(self, other: "Block") -> bool:
+        """Check whether another block is nested in this block."""
+        return self.body_start <= other.start and other.end <= self.body_end
+
+
+def line_number(source: str, offset: int) -> int:
+    """Return the line number of an offset in the source."""
+    return source.count("\n", 0, offset) + 1
+
+
+def iter_tokens(source: str) -> Iterator[Token]:
+    r"""Yield the tokens relevant to the block structure. Scheme
+       expressions such as '#(...)' yield an 'open' and a 'close' token
+       like braces; inside, only Scheme comments and the tokens of
+       embedded LilyPond code ('#{ ... #}') are yielded. Hence, braces
+       and quotes in Scheme character literals and comments are ignored:
+
+       >>> [b.command for b in find_blocks('#(define c #\\{)\n\\score { }')]
+       ['score']
+       >>> [b.command for b in find_blocks('#(f ; "\n)\n\\score { "x" }')]
+       ['score']
+       """
+    # for each enclosing Scheme expression, the number of open parentheses,
+    # and None for LilyPond code embedded in Scheme
+    stack: list[int | None] = []
+    pos = 0
+    while True:
+        scheme = bool(stack) and stack[-1] is not None
+        m = (re_scheme_token if scheme else re_token).search(source, pos)
+        if m is None:
+            break
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == "char" or kind == "string" and scheme:
+            continue
+        if kind == "paren":
+            stack[-1] += 1 if m.group() == "(" else -1
+            if stack[-1]:
+                continue
+            stack.pop()
+            kind = "close"
+        elif kind == "scheme":
+            stack.append(1)
+            kind = "open"
+        elif kind == "open" and scheme:
+            stack.append(None)
+        elif kind == "close" and m.group() == "#}" and stack:
+            stack.pop()
+        yield Token(kind, m.start(), m.end())
+
+
+def iter_blocks(source: str,
+                commands: tuple[str, ...] | None = BLOCK_COMMANDS
+                ) -> Iterator[Block]:
+    """Scan the source in a single pass and yield blocks of the given
+       commands (all commands if None) in the order of their closing
+       braces, i.e., nested blocks first. Braces in strings, comments, and
+       Scheme code are ignored, and '#{ ... #}' as well as Scheme
+       expressions count as a pair of braces.
+       Raises ValueError if braces are unbalanced."""
+    # stack of open braces: (command, offset of command, offset after brace)
+    stack: list[tuple[str, int, int]] = []
+    # most recent command that may be followed by a block, and whether
+    # only whitespace and comments have occurred since then
+    pending: tuple[str, int] | None = None
+    blank = True
+    last_end = 0
+    for token in iter_tokens(source):
+        kind = token.kind
+        blank = blank and not source[last_end:token.start].strip()
+        last_end = token.end
+        if kind == "comment":
+            continue
+        if kind == "open":
+            if pending is not None and blank and source[token.start] == "{":
+                command, start = pending
+            else:
+                command, start = "", token.start
+            stack.append((command, start, token.end))
+        elif kind == "close":
+            if not stack:
+                raise ValueError(
+                    f"unmatched '}}' in line "
+                    f"{line_number(source, token.start)}"
+                )
+            command, start, body_start = stack.pop()
+            if command and (commands is None or command in commands):
+                yield Block(command, start, body_start, token.start,
+                            token.end, tuple(c for c, _, _ in stack))
+        pending = ((source[token.start + 1:token.end], token.start)
+                   if kind == "command" else None)
+        blank = True
+    if stack:
+        body_start = stack[-1][2]
+        raise ValueError(
+            f"unmatched '{source[body_start - 1]}' in line "
+            f"{line_number(source, body_start)}"
+        )
+
+
+def find_blocks(source: str,
+                commands: tuple[str, ...] | None = BLOCK_COMMANDS
+                ) -> list[Block]:
+    """Return blocks of the given commands in the order of their
+       occurrence in the source."""
+    return sorted(iter_blocks(source, commands), key=lambda b: b.start)
+
+
+def iter_statements(source: str) -> Iterator[tuple[int, int]]:
+    """Yield the spans (start, end) of top-level statements. A statement
+       starts with a line outside of braces, Scheme expressions, strings,
+       and comments that is neither blank nor indented, and comprises all
+       following lines until the next statement."""
+    tokens = iter_tokens(source)
+    token = next(tokens, None)
+    depth = 0
+    start = None
+    for line in re.finditer(r"^[^\s}]", source, re.MULTILINE):
+        offset = line.start()
+        while token is not None and token.end <= offset:
+            if token.kind == "open":
+                depth += 1
+            elif token.kind == "close":
+                depth = max(depth - 1, 0)
+            token = next(tokens, None)
+        if depth or token is not None and token.start < offset:
+            continue
+        if start is not None:
+            yield start, offset
+        start = offset
+    if start is not None:
+        yield start, len(source)
+
+
+def top_level(blocks: list[Block], command: str) -> list[Block]:
+    """Return top-level blocks of a command. A \\context block is
+       top-level if it is part of a top-level \\layout block."""
+    parents = ("layout",) if command == "context" else ()
+    return [b for b in blocks if b.command == command and b.parents == parents]
+
+
+def children(blocks: list[Block], parent: Block,
+             command: str | None = None) -> list[Block]:
+    """Return blocks directly nested in a parent block, optionally
+       restricted to one command."""
+    depth = len(parent.parents) + 1
+    return [b for b in blocks
+            if parent.contains(b) and len(b.parents) == depth
+               and (command is None or b.command == command)]
+
+
+def main() -> None:
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="List blocks such as \\paper, \\bookpart, or \\score "
+                    "in LilyPond files."
+    )
+    parser.add_argument("files", nargs="+", help="LilyPond files")
+    parser.add_argument(
+        "-c",
+        "--commands",
+        nargs="+",
+        default=list(BLOCK_COMMANDS),
+        help=f"""list blocks of these commands
+                 (default: {" ".join(BLOCK_COMMANDS)})"""
+    )
+    args = parser.parse_args()
+
+    for file in args.files:
+        with open(file, encoding="utf8") as f:
+            source = f.read()
+        for block in find_blocks(source, tuple(args.commands)):
+            print(f"{file}:{line_number(source, block.start)}-"
+                  f"{line_number(source, block.end)}: "
+                  f"{'  ' * len(block.parents)}\\{block.command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Determine the files that LilyPond scores depend on and write them
+   as dependency files for make."""
+
+import argparse
+from os import getenv, makedirs, path
+import re
+from typing import NamedTuple
+
+import ly_blocks
+
+
+re_include = re.compile(r'\\include\s+"([^"]+)"')
+re_assignment = re.compile(rf"({ly_blocks.IDENTIFIER})\s*=")
+re_reference = re.compile(rf"\\({ly_blocks.IDENTIFIER})")
+
+
+class FileInfo(NamedTuple):
+    """Top-level statements of a LilyPond file."""
+    includes: list[str]                 # included files as written
+    definitions: dict[str, set[str]]    # variable -> referenced variables
+    references: set[str]                # referenced by other statements
+    pure: bool                          # only variable definitions
+
+
+def strip_comments(source: str) -> str:
+    """Remove comments from LilyPond and Scheme code."""
+    pieces = []
+    pos = 0
+    for token in ly_blocks.iter_tokens(source):
+        if token.kind == "comment":
+            pieces.append(source[pos:token.start])
+            pos = token.end
+    pieces.append(source[pos:])
+    return "".join(pieces)
+
+
+def scan_file(file: str) -> FileInfo:
+    """Find the includes, variable definitions, and references
+       of a LilyPond file."""
+    with open(file, encoding="utf8") as f:
+        source = strip_comments(f.read())
+
+    info = FileInfo([], {}, set(), True)
+    for start, end in ly_blocks.iter_statements(source):
+        statement = source[start:end]
+        if not statement.strip() or statement.startswith("\\version"):
+            continue
+        references = set(re_reference.findall(statement))
+        info.includes.extend(re_include.findall(statement))
+        variable = re_assignment.match(statement)
+        if variable:
+            info.definitions.setdefault(variable.group(1), set()) \
+                            .update(references)
+            continue
+        info.references.update(references)
+        info = info._replace(pure=False)
+    return info
+
+
+def resolve_include(name: str, including_file: str,
+                    include_dirs: list[str]) -> str | None:
+    """Find an included file like LilyPond with relative includes, i.e.,
+       relative to the including file and then in the include path."""
+    for directory in [path.dirname(including_file), *include_dirs]:
+        file = path.normpath(path.join(directory, name))
+        if path.isfile(file):
+            return file
+    return None
+
+
+def include_closure(score_file: str,
+                    include_dirs: list[str]) -> dict[str, FileInfo]:
+    """Get the score and all files it includes (directly or indirectly)
+       in the order of their first inclusion. Files that cannot be found
+       (e.g., files shipped with LilyPond) are skipped."""
+    files: dict[str, FileInfo] = {}
+    pending = [score_file]
+    while pending:
+        file = pending.pop(0)
+        if file in files:
+            continue
+        files[file] = scan_file(file)
+        for name in files[file].includes:
+            included = resolve_include(name, file, include_dirs)
+            if included is not None:
+                pending.append(included)
+    return files
+
+
+def score_dependencies(score_file: str, include_dirs: list[str]) -> list[str]:
+    """Get the files a score depends on. These are all files included
+       by the score, except for files that only contain definitions of
+       variables which the score does not use (e.g., the notes of other
+       instruments)."""
+    files = include_closure(score_file, include_dirs)
+
+    # follow the references, starting with the statements that
+    # are always evaluated
+    definitions: dict[str, set[str]] = {}
+    for info in files.values():
+        for variable, references in info.definitions.items():
+            definitions.setdefault(variable, set()).update(references)
+    used: set[str] = set()
+    pending_refs = [r for info in files.values() for r in info.references]
+    while pending_refs:
+        variable = pending_refs.pop()
+        if variable in used or variable not in definitions:
+            continue
+        used.add(variable)
+        pending_refs.extend(definitions[variable])
+
+    return [f for f, info in files.items()
+            if f == score_file
+               or not info.pure
+               or used.intersection(info.definitions)]
+
+
+def main() -> None:
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="""Write a dependency file for make, which lists all
+                       files included by a score except for those that only
+                       define variables the score does not use."""
+    )
+    parser.add_argument("score", help="LilyPond file")
+    parser.add_argument(
+        "-t",
+        "--target",
+        required=True,
+        help="make target that depends on the score (e.g., tmp/vl1.pdf)"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="dependency file (default: target with suffix '.d')"
+    )
+    parser.add_argument(
+        "-I",
+        "--include",
+        action="append",
+        default=[getenv("EES_TOOLS_PATH", ".")],
+        help="""search included files in this folder
+                (may be repeated; default: $EES_TOOLS_PATH)""",
+        metavar="DIR"
+    )
+    args = parser.parse_args()
+
+    output = args.output or path.splitext(args.target)[0] + ".d"
+    dependencies = score_dependencies(args.score, args.include)
+    makedirs(path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf8") as f:
+        f.write(f"{args.target} {output}: {' '.join(dependencies)}\n")
+        # empty rules prevent errors if a file is removed
+        f.writelines(f"\n{d}:\n" for d in dependencies[1:])
+
+
+if __name__ == "__main__":
+    main()
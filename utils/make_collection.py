@@ -1,9 +1,19 @@
 """Merge works files to create a collection."""
 
-from os import makedirs
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import json
+from os import cpu_count, makedirs, path
 import re
-import subprocess
-from sys import argv
+import sys
+import textwrap
+
+# read_metadata.py resides in the parent folder
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+import read_metadata  # pylint: disable=wrong-import-position
+import ly_blocks  # pylint: disable=wrong-import-position
 
 
 FRONT_MATTER_TEMPLATE = """\
@@ -91,208 +101,564 @@ FULL_SCORE_TEMPLATE = """\
 }}
 """
 
+# top-level statements in definitions.ly
+re_include = re.compile(r'\\include\s+"([^"]+)"')
+re_assignment = re.compile(rf"({ly_blocks.IDENTIFIER})\s*=")
+
 DEFINITIONS_HEADER = """\
 % created by make_collection.py
 % manual adjustments: [describe here]
 """
 
 
-PYTHON_CALL = """
-mkdir -p tmp/{name}
-python $EES_TOOLS_PATH/read_metadata.py edition \\
-    -i works/{work}/metadata.yaml \\
-    -o tmp/{name}/metadata_{work}.macros \\
-    -t full_score \\
-    -k festival genre lyrics toe \\
-    -c tag
-"""
-
-
-def extract_value(metadata: str, key: str) -> str:
-    """Extracts the value from a metadata LaTeX macro."""
-    value = re.search(
-        rf"\\def\\Metadata{key}{{(.*?)}}\n\\def",
-        metadata,
-        re.DOTALL
+ADDITIONAL_KEYS = ["festival", "genre", "lyrics", "toe"]
+
+# fragment cache of the works in the collection repository
+CACHE_FILE = "tmp/.make_collection_cache.json"
+CACHE_VERSION = 1
+
+# files that determine the generated fragments besides the works
+TOOLS_FILES = [
+    path.realpath(__file__),
+    ly_blocks.__file__,
+    read_metadata.__file__,
+    read_metadata.instrument_data_file
+]
+
+
+def make_metadata(work: str) -> tuple[dict[str, str] | None, str | None]:
+    """Generate the metadata of a work, i.e., the values of the
+       metadata macros created by read_metadata.py (e.g., 'Title').
+       Returns a tuple (metadata, error message)."""
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            metadata = read_metadata.parse_metadata(
+                file=f"works/{work}/metadata.yaml",
+                score_type="full_score",
+                checksum_from="tag"
+            )
+    # error_exit() raises SystemExit, which must not end the whole run
+    except (Exception, SystemExit) as e: # pylint: disable=broad-exception-caught
+        return None, output.getvalue().strip() or f"{type(e).__name__}: {e}"
+
+    return read_metadata.get_macro_values(metadata, ADDITIONAL_KEYS), None
+
+
+def format_work(metadata: dict[str, str]) -> tuple[str, list[str]]:
+    """Format the section of a work in the critical report.
+       Returns a tuple (section, abbreviations)."""
+    abbreviations = [a for a in metadata["Abbreviations"]
+                                 .replace(" ", "")
+                                 .split("\n")
+                       if a.startswith("\\abbr")]
+
+    # format selected metadata values
+    festival = metadata.get("Festival", "")
+    if not festival:
+        festival = "–"
+
+    toe_contents = metadata.get("Toe", "")
+    if toe_contents:
+        toe = TOE_TEMPLATE.format(toe_contents)
+    else:
+        toe = ""
+
+    lyrics = metadata.get("Lyrics", "")
+    if lyrics:
+        lyrics = LYRICS_TEMPLATE.format(lyrics)
+
+    section = WORK_TEMPLATE.format(
+        title=metadata["Title"],
+        subtitle=metadata["Subtitle"],
+        genre=metadata.get("Genre", ""),
+        festival=festival,
+        scoring=metadata["Scoring"].replace("\\\\", " "),
+        sources=metadata["Sources"],
+        toe=toe,
+        lyrics=lyrics,
     )
-    if not value:
-        return ""
-    return value.group(1)
+    return section, abbreviations
 
 
-def get_definitions(work: str) -> list[str]:
-    """Extracts info from definitions.ly of a single work"""
+def get_definitions(work: str) -> list[tuple[str, str, str]]:
+    """Split definitions.ly of a single work into top-level statements.
+       Returns a list of tuples (kind, key, text), where kind is
+       'include' (key: normalized path), 'variable' (key: name),
+       or 'other' (key: stripped text)."""
     def_file = f"works/{work}/definitions.ly"
-    res = [f"\n% from {def_file}\n"]
     with open(def_file, encoding="utf8") as f:
-        for line in f:
-            if line.startswith("\\version"):
+        source = f.read()
+
+    res = []
+    for start, end in ly_blocks.iter_statements(source):
+        text = source[start:end]
+        if text.startswith("\\version"):
+            continue
+
+        include = re_include.match(text)
+        if include:
+            # paths relative to the work (e.g., notes) become relative to
+            # the collection; others are found via the include path
+            file = path.normpath(path.join("works", work, include.group(1)))
+            if path.exists(file):
+                text = text.replace(include.group(0),
+                                    f'\\include "{file}"',
+                                    1)
+            else:
+                file = include.group(1)
+            res.append(("include", file, text))
+            continue
+
+        variable = re_assignment.match(text)
+        if variable:
+            res.append(("variable", variable.group(1), text))
+        else:
+            res.append(("other", text.strip(), text))
+    return res
+
+
+def rename_variables(text: str, names: dict[str, str]) -> str:
+    """Rename variables in their references and in assignments
+       at the start of top-level statements."""
+    if not names:
+        return text
+    pattern = "|".join(map(re.escape, sorted(names, key=len, reverse=True)))
+    re_name = re.compile(rf"({pattern})(?=\s*=)")
+    starts = [start for start, _ in ly_blocks.iter_statements(text)]
+    for start in reversed(starts):
+        assignment = re_name.match(text, start)
+        if assignment:
+            text = (text[:start]
+                    + names[assignment.group(1)]
+                    + text[assignment.end():])
+    return re.sub(
+        rf"\\({pattern}){ly_blocks.IDENTIFIER_END}",
+        lambda m: "\\" + names[m.group(1)],
+        text
+    )
+
+
+def merge_definitions(
+    definitions: dict[str, list[tuple[str, str, str]]]
+) -> tuple[list[str], dict[str, dict[str, str]], list[str]]:
+    """Merge the definitions of all works, skipping duplicate includes,
+       statements, and variable definitions of previous works. If a
+       variable has been defined differently by a previous work, it is
+       renamed in the current work (e.g., 'tempoKyrie' -> 'tempoKyrieWorkII').
+       Variables defined several times by the same work are kept in order,
+       since LilyPond uses the last definition.
+       Returns a tuple (merged definitions, renamed variables per work,
+       warnings)."""
+    res = [DEFINITIONS_HEADER]
+    seen: set[tuple[str, str]] = set()
+    variables: dict[str, str] = {}  # last definition by previous works
+    renamed: dict[str, dict[str, str]] = {}
+    warnings = []
+
+    for i, (work, statements) in enumerate(definitions.items(), start=1):
+        res.append(f"\n% from works/{work}/definitions.ly\n")
+
+        # renaming a variable may change definitions that refer to it
+        suffix = "Work" + read_metadata.arabic_to_roman(i)
+        names: dict[str, str] = {}
+        conflicts = True
+        while conflicts:
+            conflicts = [
+                key for kind, key, text in statements
+                if kind == "variable"
+                   and key not in names
+                   and key in variables
+                   and variables[key] != rename_variables(text, names).strip()
+            ]
+            names |= {key: key + suffix for key in conflicts}
+        renamed[work] = names
+
+        current: dict[str, str] = {}  # definitions by this work
+        for kind, key, text in statements:
+            text = rename_variables(text, names)
+            if kind == "variable":
+                key = names.get(key, key)
+                if key in current:
+                    warnings.append(f"works/{work}/definitions.ly defines "
+                                    f"variable {key} several times")
+                elif key in variables:
+                    continue
+                current[key] = text.strip()
+            elif (kind, key) in seen:
                 continue
-            if line.startswith("\\include"):
-                res.append(
-                    line.replace(
-                        "notes",
-                        f"works/{work}/notes"
-                    )
-                )
+            seen.add((kind, key))
+            res.append(text)
+        variables |= current
+
+    return res, renamed, warnings
+
+
+def check_included_files(
+    definitions: dict[str, list[tuple[str, str, str]]],
+    renamed: dict[str, dict[str, str]]
+) -> list[str]:
+    """Check the files included by the definitions of each work (e.g.,
+       the notes), which cannot be modified. Variables defined differently
+       by several works must be renamed manually since the last definition
+       is used for all works; the same applies to references to variables
+       that have been renamed by merge_definitions().
+       Returns a list of warnings."""
+    found: dict[str, dict[str, list[str]]] = {}
+    warnings = []
+    for work, statements in definitions.items():
+        names = "|".join(map(re.escape, renamed[work]))
+        re_reference = (re.compile(rf"\\({names}){ly_blocks.IDENTIFIER_END}")
+                        if names else None)
+        for kind, file, _ in statements:
+            if (kind != "include"
+                or not file.startswith(path.join("works", work, ""))):
                 continue
-            res.append(line)
-    return res
+            with open(file, encoding="utf8") as f:
+                source = f.read()
 
+            for start, end in ly_blocks.iter_statements(source):
+                variable = re_assignment.match(source, start, end)
+                if variable:
+                    text = source[start:end].strip()
+                    found.setdefault(variable.group(1), {}) \
+                         .setdefault(text, []).append(work)
 
-def extract_paper_variables(match: re.Match | None) -> list[str]:
-    """Extract paper variables as list from Match object."""
-    if match is None:
-        return []
-    return ["      " + s.strip()
-            for s in match.group(1)
-                          .replace("\\", "\\\\")
-                          .strip()
-                          .split("\n")]
+            if re_reference is not None:
+                for name in sorted(set(re_reference.findall(source))):
+                    warnings.append(f"{file} refers to variable {name}, "
+                                    f"which has been renamed to "
+                                    f"{renamed[work][name]}")
+
+    for variable, texts in found.items():
+        if len(texts) > 1:
+            conflicting = [w for works in texts.values() for w in works]
+            warnings.append(f"Variable {variable} is defined differently "
+                            f"by works {', '.join(conflicting)}")
+    return warnings
+
+
+def paper_variables(score: str, blocks: list[ly_blocks.Block]) -> list[str]:
+    """Get the variables of \\paper blocks as list of lines."""
+    return [line.strip()
+            for block in blocks
+            for line in block.body(score).split("\n")
+            if line.strip()]
+
+
+def line_start(text: str, offset: int) -> int:
+    """Get the offset of the line containing an offset."""
+    return text.rfind("\n", 0, offset) + 1
+
+
+def indentation(text: str, offset: int) -> str:
+    """Get the indentation of the line containing an offset."""
+    start = line_start(text, offset)
+    return re.match(r"[ \t]*", text[start:offset]).group()
+
+
+def line_span(text: str, block: ly_blocks.Block) -> tuple[int, int]:
+    """Get the span of a block including its lines if the block occupies
+       complete lines."""
+    start = line_start(text, block.start)
+    end = text.find("\n", block.end)
+    end = len(text) if end == -1 else end + 1
+    if text[start:block.start].strip() or text[block.end:end].strip():
+        return block.start, block.end
+    return start, end
 
 
 def get_full_score(work: str) -> list[str]:
     """Get the full score of a work."""
     score_file = f"works/{work}/scores/full_score.ly"
     with open(score_file, encoding="utf8") as f:
-        score = "".join(f.readlines())
-
-    # get top-level paper variables
-    top_level_paper_variables = re.search(
-        r"\n\\paper {(.*?)}",
+        score = f.read()
+    blocks = ly_blocks.find_blocks(
         score,
-        re.DOTALL
+        ("paper", "bookpart", "score", "context", "layout", "midi")
     )
-    top_vars = extract_paper_variables(top_level_paper_variables)
+
+    # get top-level paper variables and context settings
+    top_vars = paper_variables(score, ly_blocks.top_level(blocks, "paper"))
+    contexts = [textwrap.dedent(score[line_start(score, b.start):b.end])
+                for b in ly_blocks.top_level(blocks, "context")]
 
     # reformat bookparts by combining paper variables
-    bookparts = re.findall(
-        r"  \\bookpart {.*?\n  }\n",
-        score,
-        re.DOTALL
-    )
+    # and adding context settings to the scores
     bookparts_reformatted: list[str] = []
-    for bookpart in bookparts:
-        paper_variables = re.search(
-            r"\\paper {(.*?)}",
-            bookpart,
-            re.DOTALL
-        )
-        paper_vars = extract_paper_variables(paper_variables)
-        all_vars = "\n".join(top_vars + paper_vars)
-
-        b = re.sub(
-            r"\\addTocEntry.*\\score",
-            r"\\addTocEntry\n    \\paper {\n"
-                + all_vars
-                + r"\n    }\n    \\score",
-            bookpart,
-            flags=re.DOTALL
-        )
-        bookparts_reformatted.append(b)
-
-    # TBD: handle top-level \context settings
+    for bookpart in [b for b in blocks if b.command == "bookpart"]:
+        bookpart_start = line_start(score, bookpart.start)
+        edits: list[tuple[int, int, str]] = []
+
+        papers = ly_blocks.children(blocks, bookpart, "paper")
+        all_vars = top_vars + paper_variables(score, papers)
+        edits += [(*line_span(score, paper), "") for paper in papers]
+
+        scores = ly_blocks.children(blocks, bookpart, "score")
+        if scores and all_vars:
+            indent = indentation(score, scores[0].start)
+            edits.append((
+                line_start(score, scores[0].start),
+                line_start(score, scores[0].start),
+                f"{indent}\\paper {{\n"
+                + "".join(f"{indent}  {v}\n" for v in all_vars)
+                + f"{indent}}}\n"
+            ))
+
+        for s in scores if contexts else []:
+            layouts = ly_blocks.children(blocks, s, "layout")
+            if layouts:
+                block = layouts[0]
+                body = block.body(score).strip()
+                lines = [body] if body else []
+            elif not ly_blocks.children(blocks, s, "midi"):
+                # scores without output definition are engraved
+                block = None
+                lines = []
+            else:
+                continue
+            indent = indentation(score, s.start) + "  "
+            layout = (
+                "\\layout {\n"
+                + textwrap.indent("\n".join(lines + contexts),
+                                  indent + "  ")
+                + f"\n{indent}}}"
+            )
+            if block is None:
+                edits.append((s.body_end, s.body_end,
+                              f"  {layout}\n{indent[:-2]}"))
+            else:
+                edits.append((block.start, block.end, layout))
+
+        text = score[bookpart_start:bookpart.end] + "\n"
+        for start, end, replacement in sorted(edits, reverse=True):
+            text = (text[:start - bookpart_start]
+                    + replacement
+                    + text[end - bookpart_start:])
+        bookparts_reformatted.append(text)
 
     return bookparts_reformatted
 
 
-def main() -> None:
-    """Main function."""
-    coll_name = argv[1]
-    works = argv[2:]
-
-    definitions: list[str] = [DEFINITIONS_HEADER]
-    full_score: list[str] = []
-    abbreviations: set[str] = set()
-    work_details: list[str] = []
-
-    for work in works:
-        # merge definitions
-        definitions += get_definitions(work)
-
-        # merge full scores
-        full_score += get_full_score(work)
-
-        # generate metadata
-        print("Generate metadata for", work)
-        subprocess.run(
-            PYTHON_CALL.format(name=coll_name, work=work),
-            check=False,
-            shell=True,
-            capture_output=True
+def file_hash(file: str) -> str | None:
+    """Get the SHA256 hash of a file, or None if it does not exist."""
+    try:
+        return read_metadata.file_hash(file)
+    except FileNotFoundError:
+        return None
+
+
+def tools_signature() -> dict:
+    """Get the hashes of the TOOLS_FILES and the fingerprint of the
+       git refs of the EES Tools repository, which determine the
+       EES Tools version."""
+    git_dir = read_metadata.find_git_dir(read_metadata.EES_TOOLS_PATH or ".")
+    return {
+        "files": [file_hash(f) for f in TOOLS_FILES],
+        "git": read_metadata.git_fingerprint(git_dir) if git_dir else None
+    }
+
+
+def metadata_signature() -> dict:
+    """Get the inputs of the metadata shared by all works, i.e.,
+       the git refs and LICENSE of the collection repository
+       and the toolchain versions."""
+    git_dir = read_metadata.find_git_dir(".")
+    return {
+        "git": read_metadata.git_fingerprint(git_dir) if git_dir else None,
+        "license": file_hash("LICENSE"),
+        "toolchain": [read_metadata.get_tool_version(t)
+                      for t in read_metadata.TOOLCHAIN]
+    }
+
+
+def load_cache(tools: dict) -> dict:
+    """Load the cached fragments of all works as a dict work -> fragments,
+       discarding them if they were made by a different version
+       of the tools."""
+    try:
+        with open(CACHE_FILE, encoding="utf8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if (not isinstance(cache, dict)
+        or cache.get("version") != CACHE_VERSION
+        or cache.get("tools") != tools):
+        return {}
+    return cache.get("works", {})
+
+
+def save_cache(tools: dict, works: dict) -> None:
+    """Save the fragment cache."""
+    try:
+        makedirs(path.dirname(CACHE_FILE), exist_ok=True)
+        read_metadata.write_json_atomic(
+            CACHE_FILE,
+            {"version": CACHE_VERSION, "tools": tools, "works": works}
         )
+    except OSError as e:
+        print(f"WARNING: Unable to save cache {CACHE_FILE}: {e}")
+
+
+def write_if_changed(file: str, text: str) -> bool:
+    """Write text to a file unless the file already has this content,
+       so that its mtime does not trigger subsequent build steps.
+       Returns whether the file was written."""
+    data = text.encode("utf8")
+    try:
+        with open(file, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(file, "wb") as f:
+        f.write(data)
+    return True
 
-        # parse metadata
-        with open(f"tmp/{coll_name}/metadata_{work}.macros",
-                  encoding="utf8") as f:
-            metadata = f.read()
 
-        # add new abbreviations
-        abbr = extract_value(metadata, "Abbreviations")
-        abbreviations.update(
-            [a for a in abbr.replace(" ", "").split("\n")
-               if a.startswith("\\abbr")]
-        )
+def main() -> None:
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Merge works to create a collection."
+    )
+    parser.add_argument("name", help="name of the collection")
+    parser.add_argument("works", nargs="+", help="included works")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=cpu_count(),
+        help="""generate the metadata of N works in parallel
+                (default: number of CPUs)""",
+        metavar="N"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_false",
+        dest="cache",
+        help=f"""regenerate the fragments of all works and do not use
+                 the fragment cache ('{CACHE_FILE}')"""
+    )
+    args = parser.parse_args()
+    coll_name = args.name
+    works = args.works
 
-        # format selected metadata values
-        festival = extract_value(metadata, "Festival")
-        if not festival:
-            festival = "–"
+    tools = tools_signature()
+    cache = load_cache(tools) if args.cache else {}
+    shared_signature = metadata_signature()
 
-        toe_contents = extract_value(metadata, "Toe")
-        if toe_contents:
-            toe = TOE_TEMPLATE.format(toe_contents)
+    # determine works whose metadata must be generated
+    fragments: dict[str, dict] = {work: {} for work in works}
+    stale_metadata: list[str] = []
+    for work in works:
+        cached = cache.get(work, {}).get("metadata", {})
+        signature = shared_signature | {
+            "metadata": file_hash(f"works/{work}/metadata.yaml")
+        }
+        if cached.get("signature") == signature:
+            fragments[work]["metadata"] = cached
         else:
-            toe = ""
-
-        lyrics = extract_value(metadata, "Lyrics")
-        if lyrics:
-            lyrics = LYRICS_TEMPLATE.format(lyrics)
-
-        # format work information
-        work_details.append(
-            WORK_TEMPLATE.format(
-                title=extract_value(metadata, "Title"),
-                subtitle=extract_value(metadata, "Subtitle"),
-                genre=extract_value(metadata, "Genre"),
-                festival=festival,
-                scoring=extract_value(metadata, "Scoring").replace("\\\\", " "),
-                sources=extract_value(metadata, "Sources"),
-                toe=toe,
-                lyrics=lyrics,
+            fragments[work]["metadata"] = {"signature": signature}
+            stale_metadata.append(work)
+    stale_works = set(stale_metadata)
+
+    with contextlib.ExitStack() as stack:
+        # generate metadata in worker processes while merging LilyPond files
+        if stale_metadata:
+            print("Generate metadata for", " ".join(stale_metadata))
+        if args.jobs > 1 and len(stale_metadata) > 1:
+            executor = stack.enter_context(
+                ProcessPoolExecutor(max_workers=args.jobs)
             )
-        )
+            results = executor.map(make_metadata, stale_metadata)
+        else:
+            results = map(make_metadata, stale_metadata)
+
+        # reuse definitions and bookparts whose files are unchanged
+        for work in works:
+            for key, file, make_fragment in (
+                ("definitions", f"works/{work}/definitions.ly",
+                 get_definitions),
+                ("full_score", f"works/{work}/scores/full_score.ly",
+                 get_full_score)
+            ):
+                cached = cache.get(work, {}).get(key, {})
+                sha256 = file_hash(file)
+                if cached.get("sha256") == sha256:
+                    fragments[work][key] = cached
+                else:
+                    fragments[work][key] = {"sha256": sha256,
+                                            "lines": make_fragment(work)}
+                    stale_works.add(work)
+
+        results = list(results)
+
+    failed = [(work, error)
+              for work, (_, error) in zip(stale_metadata, results)
+              if error is not None]
+    for work, error in failed:
+        print(f"ERROR: Metadata of work {work} could not be generated:\n"
+              f"{error}")
+    if failed:
+        sys.exit(1)
+
+    for work, (metadata, _) in zip(stale_metadata, results):
+        section, abbr = format_work(metadata)
+        fragments[work]["metadata"] |= {"values": metadata,
+                                        "section": section,
+                                        "abbreviations": abbr}
+
+    if args.cache:
+        save_cache(tools, cache | fragments)
+    print(f"Regenerated fragments of {len(stale_works)} "
+          f"of {len(works)} works")
+
+    # merge fragments
+    all_definitions = {work: fragments[work]["definitions"]["lines"]
+                       for work in works}
+    definitions, renamed, warnings = merge_definitions(all_definitions)
+    for work, names in renamed.items():
+        if names:
+            print(f"Renamed conflicting variables of work {work}:",
+                  ", ".join(f"{k} -> {v}" for k, v in names.items()))
+    warnings += check_included_files(all_definitions, renamed)
+    for warning in warnings:
+        print("WARNING:", warning)
+
+    full_score: list[str] = []
+    abbreviations: set[str] = set()
+    work_details: list[str] = []
+    for work in works:
+        full_score.append(f"  % from works/{work}/scores/full_score.ly\n")
+        full_score += [rename_variables(b, renamed[work])
+                       for b in fragments[work]["full_score"]["lines"]]
+        abbreviations.update(fragments[work]["metadata"]["abbreviations"])
+        work_details.append(fragments[work]["metadata"]["section"])
+    metadata = fragments[works[-1]]["metadata"]["values"]
 
     # format front matter
     front_matter = FRONT_MATTER_TEMPLATE.format(
         name=coll_name,
-        date=extract_value(metadata, "Date"),
-        license=extract_value(metadata, "License"),
-        lilypond_version=extract_value(metadata, "LilypondVersion"),
-        eestools_version=extract_value(metadata, "EESToolsVersion"),
-        repository=extract_value(metadata, "Repository"),
-        version=extract_value(metadata, "Version"),
-        checksum=extract_value(metadata, "Checksum"),
+        date=metadata["Date"],
+        license=metadata["License"],
+        lilypond_version=metadata["LilypondVersion"],
+        eestools_version=metadata["EESToolsVersion"],
+        repository=metadata["Repository"],
+        version=metadata["Version"],
+        checksum=metadata["Checksum"],
         abbr="\n".join(sorted(abbreviations)),
         works="\n".join(work_details)
     )
 
     # save files
     makedirs(f"collections/{coll_name}", exist_ok=True)
-    with open(f"collections/{coll_name}/critical_report.tex",
-              "w",
-              encoding="utf8") as f:
-        f.write(front_matter)
-
-    with open(f"collections/{coll_name}/definitions.ly",
-              "w",
-              encoding="utf8") as f:
-        f.write("".join(definitions))
-
-    with open(f"collections/{coll_name}/full_score.ly",
-              "w",
-              encoding="utf8") as f:
-        f.write(FULL_SCORE_TEMPLATE.format("".join(full_score)))
+    for file, text in (
+        ("critical_report.tex", front_matter),
+        ("definitions.ly", "".join(definitions)),
+        ("full_score.ly", FULL_SCORE_TEMPLATE.format("".join(full_score)))
+    ):
+        if not write_if_changed(f"collections/{coll_name}/{file}", text):
+            print(f"collections/{coll_name}/{file} is unchanged")
 
 
 if __name__ == "__main__":